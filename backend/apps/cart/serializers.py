@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
-from apps.catalog.serializers import ProductSerializer
+from apps.catalog.serializers import ProductSerializer, ProductValuesSerializer
 from apps.catalog.models import Product
+from apps.common.values import ValuesSerializer
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -27,3 +28,48 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ["id", "items", "subtotal_amount", "created_at", "updated_at"]
         read_only_fields = fields
+
+
+# ---- values-based mirrors (apps.common.values) ----
+class CartItemValuesSerializer(ValuesSerializer):
+    serializer_class = CartItemSerializer
+    computed = ("product", "line_total")
+    extra_columns = ("product",)
+
+    def fetch_related(self, rows):
+        products = ProductValuesSerializer()
+        product_rows = list(
+            products.values(
+                Product.objects.filter(pk__in={row["product"] for row in rows})
+            )
+        )
+        return {
+            row["id"]: data
+            for row, data in zip(product_rows, products.serialize(product_rows))
+        }
+
+    def get_product(self, row, related):
+        return related[row["product"]]
+
+    def get_line_total(self, row, related):
+        return row["quantity"] * related[row["product"]]["price"]
+
+
+class CartValuesSerializer(ValuesSerializer):
+    serializer_class = CartSerializer
+    computed = ("items", "subtotal_amount")
+
+    def fetch_related(self, rows):
+        items = CartItemValuesSerializer()
+        return items.serialize_by(
+            items.values(
+                CartItem.objects.filter(cart__in=[row["id"] for row in rows]), "cart"
+            ),
+            "cart",
+        )
+
+    def get_items(self, row, related):
+        return related.get(row["id"], [])
+
+    def get_subtotal_amount(self, row, related):
+        return sum(item["line_total"] for item in self.get_items(row, related))
@@ -1 +1,36 @@
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.cart.models import Cart
+from apps.catalog.models import Category, Product
+from config.routers import PIN_COOKIE
+
+
+# "default" doubles as the replica: routing runs, no second database needed
+@override_settings(REPLICA_DATABASES=["default"])
+class ReplicaPinTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+        Cart.objects.create(user=user)
+        category = Category.objects.create(name="Pins")
+        self.product = Product.objects.create(
+            title="P", category=category, price=100, stock_quantity=5
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_reading_the_cart_does_not_pin(self):
+        for _ in range(2):
+            response = self.client.get("/api/cart/")
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_adding_to_the_cart_pins(self):
+        response = self.client.post(
+            "/api/cart/", {"product": str(self.product.pk), "quantity": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
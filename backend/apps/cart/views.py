@@ -5,7 +5,15 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 
 from .serializers import CartItemSerializer
-from .services import get_cart, serialize_cart, clear_cart, upsert_cart_item, CartError
+from apps.common.conditional import not_modified, set_validators
+from .services import (
+    get_cart,
+    serialize_cart,
+    clear_cart,
+    upsert_cart_item,
+    cart_validators,
+    CartError,
+)
 
 
 class CartViewSet(viewsets.ViewSet):
@@ -13,7 +21,12 @@ class CartViewSet(viewsets.ViewSet):
 
     def list(self, request):
         cart = get_cart(request.user)
-        return Response(serialize_cart(cart), status=status.HTTP_200_OK)
+        etag, last_modified = cart_validators(cart)
+        response = not_modified(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+        response = Response(serialize_cart(cart), status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
 
     @action(detail=False, methods=["delete"])
     def clear(self, request):
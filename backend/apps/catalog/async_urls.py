@@ -0,0 +1,26 @@
+from django.urls import path
+
+from apps.catalog.async_views import AsyncProductViewSet, AsyncReviewViewSet
+
+urlpatterns = [
+    path(
+        "products/",
+        AsyncProductViewSet.as_async_view("list"),
+        name="async-product-list",
+    ),
+    path(
+        "products/suggest/",
+        AsyncProductViewSet.as_async_view("suggest"),
+        name="async-product-suggest",
+    ),
+    path(
+        "products/<uuid:pk>/",
+        AsyncProductViewSet.as_async_view("retrieve"),
+        name="async-product-detail",
+    ),
+    path(
+        "reviews/",
+        AsyncReviewViewSet.as_async_view("list"),
+        name="async-review-list",
+    ),
+]
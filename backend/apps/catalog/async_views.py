@@ -0,0 +1,35 @@
+# apps/catalog/async_views.py
+"""
+Async read path for the busiest catalog endpoints, mounted under
+/api/async/catalog/ (apps.catalog.async_urls). Same URLs below the prefix,
+query parameters and payloads as the sync viewsets; meant for the ASGI
+deployment (deploy/compose.asgi.yml), where a request waiting on the
+database or a slow client doesn't hold a worker thread.
+"""
+
+from rest_framework.response import Response
+
+from apps.catalog.serializers import SuggestQuerySerializer
+from apps.catalog.services import suggest_categories, suggest_products
+from apps.catalog.views import ProductViewSet, ReviewViewSet
+from apps.common.async_views import AsyncReadViewMixin
+from apps.common.cache import acache_response
+
+
+class AsyncProductViewSet(AsyncReadViewMixin, ProductViewSet):
+    # GET /products/suggest/?q=sne&limit=8 -> title + category completions
+    @acache_response
+    async def suggest(self, request):
+        params = SuggestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        prefix, limit = params.validated_data["q"], params.validated_data["limit"]
+        return Response(
+            {
+                "products": [row async for row in suggest_products(prefix, limit)],
+                "categories": [row async for row in suggest_categories(prefix, limit)],
+            }
+        )
+
+
+class AsyncReviewViewSet(AsyncReadViewMixin, ReviewViewSet):
+    pass
@@ -0,0 +1,113 @@
+"""
+Streaming catalog export in the record shape apps.catalog.importer reads,
+so an export can be fed straight back in. Products are read with a
+server-side cursor in `chunk_size` batches, each batch prefetching its own
+images and attributes, so memory stays flat whatever the catalog size.
+"""
+
+import csv
+import json
+
+from django.db.models import Prefetch, QuerySet
+
+from apps.catalog.importer import ATTRIBUTE_COLUMN_PREFIX
+from apps.catalog.models import Attribute, Product, ProductAttribute, ProductImage
+
+CSV_COLUMNS = [
+    "id",
+    "title",
+    "description",
+    "category",
+    "price",
+    "stock_quantity",
+    "is_active",
+    "images",
+]
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_queryset() -> QuerySet:
+    return (
+        Product.objects.filter(is_active=True)
+        .select_related("category")
+        .defer("search_vector")
+        .prefetch_related(
+            Prefetch(
+                "images",
+                queryset=ProductImage.objects.only(
+                    "id", "product_id", "url", "alt", "sort_rank", "is_primary"
+                ).order_by("sort_rank", "id"),
+            ),
+            Prefetch(
+                "attributes",
+                queryset=ProductAttribute.objects.select_related("attribute"),
+            ),
+        )
+        .order_by("pk")
+    )
+
+
+def product_record(product: Product) -> dict:
+    return {
+        "id": str(product.pk),
+        "title": product.title,
+        "description": product.description,
+        "category": product.category.name,
+        "price": product.price,
+        "stock_quantity": product.stock_quantity,
+        "is_active": product.is_active,
+        "images": [
+            {"url": image.url, "alt": image.alt, "is_primary": image.is_primary}
+            for image in product.images.all()
+        ],
+        "attributes": {
+            value.attribute.name: value.value_text for value in product.attributes.all()
+        },
+    }
+
+
+def iter_records(queryset: QuerySet, chunk_size: int = 2000):
+    # iterator(chunk_size) + prefetch_related: one prefetch round per chunk
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield product_record(product)
+
+
+def iter_ndjson(queryset: QuerySet, chunk_size: int = 2000):
+    for record in iter_records(queryset, chunk_size):
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset: QuerySet, chunk_size: int = 2000):
+    attribute_names = list(Attribute.objects.values_list("name", flat=True))
+    writer = csv.writer(_Echo())
+    yield writer.writerow(
+        CSV_COLUMNS + [ATTRIBUTE_COLUMN_PREFIX + name for name in attribute_names]
+    )
+    for record in iter_records(queryset, chunk_size):
+        # the full list (alt text, primary flag), as in NDJSON
+        record["images"] = json.dumps(
+            record["images"], ensure_ascii=False, separators=(",", ":")
+        )
+        record["is_active"] = "true" if record["is_active"] else "false"
+        attributes = record.pop("attributes")
+        yield writer.writerow(
+            [record[column] for column in CSV_COLUMNS]
+            + [attributes.get(name, "") for name in attribute_names]
+        )
+
+
+EXPORTERS = {"csv": iter_csv, "ndjson": iter_ndjson}
+
+
+def export_products(fmt: str, chunk_size: int = 2000, queryset: QuerySet | None = None):
+    """Lazily yield the active catalog as `fmt` text, line by line."""
+    if queryset is None:
+        queryset = export_queryset()
+    return EXPORTERS[fmt](queryset, chunk_size)
@@ -1,11 +1,71 @@
 import django_filters
-from apps.catalog.models import Product, Category
+from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import MD5, Cast
+from django_filters.widgets import QueryArrayWidget
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from apps.catalog.models import Product, Category, ProductAttribute
+
+# must match the config used by the search_vector trigger (migration 0002)
+SEARCH_CONFIG = "english"
+
+
+class AttributeValueField(forms.Field):
+    """["Color:Black", "Color:Red", "Size:M"] -> {"Color": {"Black", "Red"}, ...}"""
+
+    widget = QueryArrayWidget
+    default_error_messages = {
+        "invalid": "Expected name:value, got %(value)r.",
+    }
+
+    def to_python(self, value):
+        selected = {}
+        for raw in value or []:
+            name, sep, text = raw.partition(":")
+            name, text = name.strip(), text.strip()
+            if not (sep and name and text):
+                raise forms.ValidationError(
+                    self.error_messages["invalid"],
+                    code="invalid",
+                    params={"value": raw},
+                )
+            selected.setdefault(name, set()).add(text)
+        return selected
+
+
+class AttributeValueFilter(django_filters.Filter):
+    """
+    Repeatable `?attr=Name:Value`. Values of the same attribute are OR'ed,
+    different attributes AND'ed; each attribute is one `pk IN (...)`
+    subquery served by the (attribute, md5(value_text), product) index.
+    """
+
+    field_class = AttributeValueField
+
+    def filter(self, qs, value):
+        for name, values in (value or {}).items():
+            matching = (
+                ProductAttribute.objects.annotate(value_md5=MD5("value_text"))
+                .filter(
+                    attribute__name=name,
+                    # the indexed expression, then the exact value
+                    value_md5__in=[MD5(Value(text)) for text in values],
+                    value_text__in=values,
+                )
+                .values("product_id")
+            )
+            qs = qs.filter(pk__in=matching)
+        return qs
 
 
 class ProductFilter(django_filters.FilterSet):
-    # filter by category (id or name)
+    # filter by category id (including everything under it) or name
     category = django_filters.ModelChoiceFilter(
-        field_name="category", queryset=Category.objects.all()
+        queryset=Category.objects.only("path"), method="filter_category"
     )
     category_name = django_filters.CharFilter(
         field_name="category__name", lookup_expr="icontains"
@@ -21,6 +81,13 @@ class ProductFilter(django_filters.FilterSet):
     # stock availability
     in_stock = django_filters.BooleanFilter(method="filter_in_stock")
 
+    # attribute values, e.g. ?attr=Color:Black&attr=Color:Red&attr=Size:M
+    attr = AttributeValueFilter(help_text="Repeatable Name:Value attribute filter.")
+
+    def filter_category(self, queryset, name, value):
+        # the subtree is one prefix range on ix_category_path
+        return queryset.filter(category__path__startswith=value.path)
+
     def filter_in_stock(self, queryset, name, value):
         if value is True:
             return queryset.filter(stock_quantity__gt=0)
@@ -37,4 +104,34 @@ class ProductFilter(django_filters.FilterSet):
             "price_min",
             "price_max",
             "in_stock",
+            "attr",
         ]
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    `?q=` product search. On PostgreSQL it matches the GIN-indexed
+    `search_vector` (websearch syntax) and orders by rank unless the client
+    asked for an explicit ordering; other backends fall back to SearchFilter
+    (icontains over the view's search_fields).
+    """
+
+    search_param = "q"
+    search_description = "Full-text search over title and description."
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, "").strip()
+        if not terms:
+            return queryset
+        if connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        query = SearchQuery(terms, search_type="websearch", config=SEARCH_CONFIG)
+        # ts_rank() is float4; widen it so the value round-trips through
+        # keyset cursors and compares exactly
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by("-search_rank")
+        return queryset
@@ -0,0 +1,302 @@
+"""
+Streaming product import: CSV or NDJSON in, chunked upserts out.
+
+One record per product. NDJSON lines look like
+
+    {"sku": "TEE-1", "title": "Basic Tee", "category": "Tops", "price": 1999,
+     "stock_quantity": 12, "images": [{"url": "https://..."}],
+     "attributes": {"Color": "Black", "Size": "M"}}
+
+CSV uses the same column names, with `images` holding the same JSON list
+(plain "|"-separated URLs are accepted too) and one `attr:<Name>` column
+per attribute. Rows are read lazily and written
+`chunk_size` at a time, so memory stays flat whatever the file size.
+"""
+
+import csv
+import itertools
+import json
+import uuid
+
+from django.db import DatabaseError, connections, router, transaction
+
+from apps.catalog.models import (
+    Attribute,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+)
+from apps.catalog.serializers import ProductImportRowSerializer
+from apps.common.cache import bump_model_version
+
+FORMATS = ("csv", "ndjson")
+ATTRIBUTE_COLUMN_PREFIX = "attr:"
+IMAGE_SEPARATOR = "|"
+# stable product ids for `sku`-keyed rows: re-importing a feed updates in place
+SKU_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "genkimart:product-sku")
+# keep reports small for feeds that are wrong on every line
+MAX_REPORTED_ERRORS = 100
+
+PRODUCT_UPDATE_FIELDS = [
+    "title",
+    "description",
+    "category",
+    "price",
+    "stock_quantity",
+    "is_active",
+    "updated_at",
+]
+
+
+class ImportFormatError(Exception):
+    """The feed cannot be read at all (unknown format, missing columns)."""
+
+
+def detect_format(filename: str, requested: str | None = None) -> str:
+    fmt = (requested or filename.rsplit(".", 1)[-1]).lower()
+    fmt = {"jsonl": "ndjson", "json": "ndjson"}.get(fmt, fmt)
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unsupported format {fmt!r}; use csv or ndjson.")
+    return fmt
+
+
+def read_ndjson(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, None, {"non_field_errors": [f"Invalid JSON: {exc.msg}"]}
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, {"non_field_errors": ["Expected a JSON object."]}
+            continue
+        yield line_no, record, None
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise ImportFormatError("CSV file has no header row.")
+    for row in reader:
+        # blank cells mean "not given"
+        record = {k: v for k, v in row.items() if k and v not in (None, "")}
+        images = record.pop("images", None)
+        if images:
+            try:
+                record["images"] = csv_images(images)
+            except json.JSONDecodeError as exc:
+                yield reader.line_num, None, {"images": [f"Invalid JSON: {exc.msg}"]}
+                continue
+        attributes = {
+            key[len(ATTRIBUTE_COLUMN_PREFIX) :]: record.pop(key)
+            for key in list(record)
+            if key.startswith(ATTRIBUTE_COLUMN_PREFIX)
+        }
+        if attributes:
+            record["attributes"] = attributes
+        yield reader.line_num, record, None
+
+
+def csv_images(cell: str) -> list:
+    """A CSV `images` cell: a JSON list of images, or "|"-separated URLs."""
+    if cell.lstrip().startswith("["):
+        return json.loads(cell)
+    return [{"url": url.strip()} for url in cell.split(IMAGE_SEPARATOR) if url.strip()]
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def product_id(row: dict) -> uuid.UUID:
+    return row.get("id") or uuid.uuid5(SKU_NAMESPACE, row["sku"])
+
+
+class ProductImporter:
+    """
+    Validates rows one by one and upserts them per chunk:
+
+    - Product: bulk_create(update_conflicts) on the primary key
+    - ProductImage: replaced wholesale for products whose row lists images
+    - ProductAttribute: bulk_create(update_conflicts) on (product, attribute)
+
+    Each chunk is its own transaction; a failing chunk is rolled back,
+    reported, and the import moves on.
+    """
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self.categories = {}  # name -> id, grows across chunks
+        self.attributes = {}
+        self.report = {
+            "rows": 0,
+            "imported": 0,
+            "failed": 0,
+            "chunks": 0,
+            "errors": [],
+        }
+
+    def run(self, stream, fmt: str, on_chunk=None) -> dict:
+        rows = READERS[fmt](stream)
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+                if on_chunk:
+                    on_chunk(self.report)
+        finally:
+            if self.report["imported"]:
+                # bulk writes send no signals
+                for model in (
+                    Category,
+                    Attribute,
+                    Product,
+                    ProductImage,
+                    ProductAttribute,
+                ):
+                    bump_model_version(model)
+        return self.report
+
+    def error(self, **entry):
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append(entry)
+
+    def import_chunk(self, chunk):
+        self.report["chunks"] += 1
+        self.report["rows"] += len(chunk)
+
+        accepted = 0
+        valid = {}  # product id -> (line, row); the last row for an id wins
+        for line_no, record, errors in chunk:
+            if errors is None:
+                serializer = ProductImportRowSerializer(data=record)
+                if serializer.is_valid():
+                    row = serializer.validated_data
+                    valid[product_id(row)] = (line_no, row)
+                    accepted += 1
+                    continue
+                errors = serializer.errors
+            self.report["failed"] += 1
+            self.error(line=line_no, errors=errors)
+        if not valid:
+            return
+
+        try:
+            with transaction.atomic():
+                self.write(valid)
+        except DatabaseError as exc:
+            # names created inside the rolled-back transaction are gone again
+            self.categories.clear()
+            self.attributes.clear()
+            self.report["failed"] += accepted
+            self.error(lines=[chunk[0][0], chunk[-1][0]], error=str(exc).strip())
+        else:
+            self.report["imported"] += accepted
+
+    def write(self, valid: dict):
+        rows = [row for _, row in valid.values()]
+        categories = self.resolve(
+            Category,
+            self.categories,
+            {r["category"] for r in rows},
+            build=Category.new_root,
+        )
+        attributes = self.resolve(
+            Attribute,
+            self.attributes,
+            {name for r in rows for name in r.get("attributes", {})},
+        )
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    id=pk,
+                    title=row["title"],
+                    description=row["description"],
+                    category_id=categories[row["category"]],
+                    price=row["price"],
+                    stock_quantity=row["stock_quantity"],
+                    is_active=row["is_active"],
+                )
+                for pk, (_, row) in valid.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+
+        with_images = {pk: row for pk, (_, row) in valid.items() if "images" in row}
+        if with_images:
+            self.delete_images(with_images)
+            ProductImage.objects.bulk_create(
+                [
+                    image
+                    for pk, row in with_images.items()
+                    for image in self.build_images(pk, row)
+                ]
+            )
+
+        ProductAttribute.objects.bulk_create(
+            [
+                ProductAttribute(
+                    product_id=pk,
+                    attribute_id=attributes[name],
+                    value_text=value,
+                    sort_rank=(rank + 1) * 10,
+                )
+                for pk, (_, row) in valid.items()
+                for rank, (name, value) in enumerate(row.get("attributes", {}).items())
+            ],
+            update_conflicts=True,
+            unique_fields=["product", "attribute"],
+            update_fields=["value_text", "sort_rank", "updated_at"],
+        )
+
+    def delete_images(self, product_ids):
+        """
+        One DELETE for the chunk's images. QuerySet.delete() would load and
+        signal every row (touching its product and bumping cache versions
+        per image), which the import already does once per run.
+        """
+        stale = ProductImage.objects.filter(product_id__in=product_ids).values("pk")
+        sql, params = stale.query.sql_with_params()
+        connection = connections[router.db_for_write(ProductImage)]
+        table = connection.ops.quote_name(ProductImage._meta.db_table)
+        pk = connection.ops.quote_name(ProductImage._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+
+    def build_images(self, pk, row) -> list[ProductImage]:
+        images = row["images"]
+        primary = next((i for i, image in enumerate(images) if image["is_primary"]), 0)
+        return [
+            ProductImage(
+                product_id=pk,
+                url=image["url"],
+                alt=image.get("alt", row["title"]),
+                sort_rank=rank,
+                is_primary=rank == primary,
+            )
+            for rank, image in enumerate(images)
+        ]
+
+    def resolve(self, model, known: dict, names: set, build=None) -> dict:
+        """name -> id for `names`, creating the missing ones (as `build(name=)`)."""
+        missing = names - known.keys()
+        if missing:
+            build = build or model
+            model.objects.bulk_create(
+                [build(name=name) for name in missing], ignore_conflicts=True
+            )
+            known.update(
+                model.objects.filter(name__in=missing).values_list("name", "id")
+            )
+        return known
+
+
+def import_products(stream, fmt: str, chunk_size: int = 1000, on_chunk=None) -> dict:
+    return ProductImporter(chunk_size=chunk_size).run(stream, fmt, on_chunk=on_chunk)
@@ -1,11 +1,14 @@
+import functools
+import multiprocessing
 import random
 import string
-from datetime import timedelta
+import time
+import uuid
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from apps.catalog.models import (
     Category,
@@ -13,61 +16,344 @@ from apps.catalog.models import (
     ProductImage,
     Attribute,
     ProductAttribute,
+    ProductTombstone,
     Review,
 )
+from apps.catalog.popularity import CHECKPOINT as POPULARITY_CHECKPOINT
+from apps.catalog.related import BOUGHT_TOGETHER_CHECKPOINT
+from apps.catalog.services import STARS
+from apps.common.cache import bump_model_version
+from apps.common.models import JobCheckpoint
+from apps.orders.models import Order, OrderItem
 
 ADJS = ["Classic", "Modern", "Premium", "Eco", "Urban", "Sport", "Casual", "Basic"]
 NOUNS = ["Sneaker", "Jacket", "Tee", "Jeans", "Boot", "Bag", "Watch", "Cap", "Sandal"]
 COLORS = ["Black", "White", "Navy", "Olive", "Grey", "Beige", "Red", "Blue"]
 SIZES = ["XS", "S", "M", "L", "XL"]
 MATERIALS = ["Cotton", "Wool", "Denim", "Leather", "Polyester", "Linen"]
+REVIEW_TITLES = ["Great!", "Love it", "Solid value", "Not bad", "Could be better", ""]
+FIRST_NAMES = ["Alex", "Sam", "Jamie", "Taylor", "Kai", "Mika"]
+INITIALS = ["S.", "K.", "R.", "M.", "A."]
+
+CATEGORY_TREE = {
+    "Shoes": ["Running", "Sneakers", "Boots"],
+    "Tops": ["T-Shirts", "Shirts", "Hoodies"],
+    "Bottoms": ["Jeans", "Shorts"],
+    "Accessories": ["Caps", "Belts"],
+    "Bags": [],
+    "Watches": [],
+}
 
 PLACEHOLDER_IMG = "https://picsum.photos/seed/{seed}/800/800"
 
 
-def rand_words(n=8):
+def clear_order(*roots, keep=()) -> list:
+    """
+    `roots` and every model pointing at them (derived tables and cart lines
+    included), children first, so plain DELETEs never trip a foreign key.
+    Models in `keep` are left out: a row of theirs still pointing at the
+    catalogue makes the DELETE fail instead of vanishing.
+    """
+    ordered, seen = [], set(keep)
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        # reverse relations, hidden ones (related_name="+") too
+        for relation in model._meta.get_fields(include_hidden=True):
+            if relation.auto_created and not relation.concrete:
+                if relation.one_to_many or relation.one_to_one:
+                    visit(relation.related_model)
+        ordered.append(model)
+
+    for model in roots:
+        visit(model)
+    return ordered
+
+
+def _vocabulary(size=5000):
+    rng = random.Random(0)
     letters = string.ascii_lowercase
-    words = []
-    for _ in range(n):
-        wlen = random.randint(3, 10)
-        words.append("".join(random.choice(letters) for _ in range(wlen)))
-    return " ".join(words).capitalize()
+    return ["".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(size)]
+
+
+# a fixed pool of pseudo-words: cheap to sample, and repeats like real text
+VOCABULARY = _vocabulary()
+
+
+def rand_words(rng, n=8):
+    return " ".join(rng.choices(VOCABULARY, k=n)).capitalize()
+
+
+def rand_uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def seed_chunk(chunk, *, seed, refs, batch_size):
+    """
+    Build and insert products [start, stop) with their images, attributes and
+    reviews. The RNG is derived from (seed, chunk index) only, so the data is
+    identical however chunks are spread across workers.
+    """
+    index, start, stop = chunk
+    rng = random.Random(f"{seed}:{index}")
+    products, images, attributes, reviews = [], [], [], []
+
+    for _ in range(start, stop):
+        product = Product(
+            id=rand_uuid(rng),
+            title=f"{rng.choice(ADJS)} {rng.choice(NOUNS)}",
+            description=rand_words(rng, 40),
+            category_id=rng.choice(refs["categories"]),
+            is_active=rng.random() > 0.05,
+            price=rng.randint(1500, 35000),
+            stock_quantity=max(0, int(rng.gauss(30, 20))),
+        )
+        products.append(product)
+
+        # images
+        primary_rank = rng.randint(0, 2)
+        for rank in range(3):
+            images.append(
+                ProductImage(
+                    id=rand_uuid(rng),
+                    product_id=product.id,
+                    url=PLACEHOLDER_IMG.format(seed=f"{product.id.hex[:8]}-{rank}"),
+                    alt=f"{product.title} image {rank + 1}",
+                    sort_rank=rank,
+                    is_primary=(rank == primary_rank),
+                )
+            )
+
+        # attributes
+        for sort_rank, (attribute_id, values) in enumerate(
+            [
+                (refs["color"], COLORS),
+                (refs["size"], SIZES),
+                (refs["material"], MATERIALS),
+            ],
+            start=1,
+        ):
+            attributes.append(
+                ProductAttribute(
+                    id=rand_uuid(rng),
+                    product_id=product.id,
+                    attribute_id=attribute_id,
+                    value_text=rng.choice(values),
+                    sort_rank=sort_rank * 10,
+                )
+            )
+
+        # reviews; bulk_create sends no signals, so the rating aggregates
+        # are filled in here instead of by apps.catalog.signals
+        ratings = []
+        for _ in range(rng.randint(0, 5)):
+            author_id = None
+            if refs["users"] and rng.random() < 0.6:
+                author_id = rng.choice(refs["users"])
+            rating = rng.randint(1, 5)
+            ratings.append(rating)
+            reviews.append(
+                Review(
+                    id=rand_uuid(rng),
+                    product_id=product.id,
+                    rating=rating,
+                    title=rng.choice(REVIEW_TITLES),
+                    body=rand_words(rng, 50),
+                    author_id=author_id,
+                    author_name=""
+                    if author_id
+                    else f"{rng.choice(FIRST_NAMES)} {rng.choice(INITIALS)}",
+                )
+            )
+        for star in STARS:
+            setattr(product, f"rating_{star}", ratings.count(star))
+        product.rating_count = len(ratings)
+        product.rating_avg = sum(ratings) / len(ratings) if ratings else 0.0
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products, batch_size=batch_size)
+        ProductImage.objects.bulk_create(images, batch_size=batch_size)
+        ProductAttribute.objects.bulk_create(attributes, batch_size=batch_size)
+        Review.objects.bulk_create(reviews, batch_size=batch_size)
+    return len(products), len(reviews)
 
 
 class Command(BaseCommand):
-    help = "Populate catalog with quick dummy data (categories, products, images, attributes, reviews)."
+    help = "Populate catalog with dummy data (categories, products, images, attributes, reviews)."
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--products",
             type=int,
             default=40,
-            help="How many products to create (approx).",
+            help="How many products to create.",
         )
         parser.add_argument(
             "--clear",
             action="store_true",
-            help="Delete existing catalog data before seeding.",
+            help="Delete existing catalog data (with the cart lines and the "
+            "derived popularity/related tables) before seeding. Refuses while "
+            "orders have lines for catalogue products.",
+        )
+        parser.add_argument(
+            "--delete-orders",
+            action="store_true",
+            help="With --clear: delete the orders (and their payments) whose "
+            "lines point at catalogue products, instead of refusing.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products per chunk (one transaction, one INSERT per table).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="RNG seed; the same seed and --batch-size give the same data.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes inserting chunks in parallel (PostgreSQL only).",
         )
 
-    @transaction.atomic
     def handle(self, *args, **opts):
         product_target = max(1, int(opts["products"]))
+        batch_size = max(1, int(opts["batch_size"]))
+        workers = max(1, int(opts["workers"]))
+        seed = opts["seed"]
+        if seed is None:
+            seed = random.randrange(2**32)
+        if workers > 1 and connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{connection.vendor} has a single writer; using 1 worker"
+                )
+            )
+            workers = 1
+
+        cleared = self.clear(opts["delete_orders"]) if opts["clear"] else []
+
+        refs = self.reference_data()
+
+        self.stdout.write(
+            f"Creating {product_target} products (seed={seed}, "
+            f"batch={batch_size}, workers={workers})…"
+        )
+        chunks = [
+            (index, start, min(start + batch_size, product_target))
+            for index, start in enumerate(range(0, product_target, batch_size))
+        ]
+        task = functools.partial(
+            seed_chunk, seed=seed, refs=refs, batch_size=batch_size
+        )
 
-        if opts["clear"]:
-            self.stdout.write("Clearing existing data…")
-            Review.objects.all().delete()
-            ProductImage.objects.all().delete()
-            ProductAttribute.objects.all().delete()
-            Product.objects.all().delete()
-            Attribute.objects.all().delete()
-            Category.objects.all().delete()
+        started = time.monotonic()
+        created_products = created_reviews = 0
+
+        def progress(result):
+            nonlocal created_products, created_reviews
+            created_products += result[0]
+            created_reviews += result[1]
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"  {created_products}/{product_target} products "
+                f"({created_products / max(elapsed, 1e-9):.0f}/s)"
+            )
 
+        if workers == 1:
+            for chunk in chunks:
+                progress(task(chunk))
+        else:
+            # forked children must not share the parent's sockets or pool
+            connections.close_all()
+            for conn in connections.all(initialized_only=True):
+                if conn.vendor == "postgresql":
+                    conn.close_pool()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                for result in pool.imap_unordered(task, chunks):
+                    progress(result)
+
+        # bulk_create and the raw DELETEs bypassed the signals that
+        # invalidate cached responses
+        for model in {
+            Category,
+            Attribute,
+            Product,
+            ProductImage,
+            ProductAttribute,
+            Review,
+            *cleared,
+        }:
+            bump_model_version(model)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✔ Seed complete: {created_products} products, "
+                f"{created_reviews} reviews in {time.monotonic() - started:.1f}s"
+            )
+        )
+        self.stdout.write(
+            f"Categories: {Category.objects.count()}, "
+            f"Attributes: {Attribute.objects.count()}, "
+            f"Products: {Product.objects.count()}, "
+            f"Images: {ProductImage.objects.count()}, "
+            f"Reviews: {Review.objects.count()}"
+        )
+
+    @transaction.atomic
+    def clear(self, delete_orders: bool) -> list:
+        """Empty the catalogue and what derives from it; returns the models."""
+        orders = Order.objects.filter(pk__in=OrderItem.objects.values("order"))
+        if orders.exists():
+            if not delete_orders:
+                raise CommandError(
+                    f"{orders.count()} orders have lines for catalogue products; "
+                    "--clear would strip them. Pass --delete-orders to delete "
+                    "those orders as well."
+                )
+            self.stdout.write(f"Deleting {orders.count()} orders…")
+            # through the ORM: payments and refunds cascade
+            orders.delete()
+
+        models = clear_order(Category, Attribute, keep={OrderItem})
+        self.stdout.write(
+            "Clearing existing data ("
+            + ", ".join(model._meta.label for model in models)
+            + ")…"
+        )
+        quote = connection.ops.quote_name
+        tombstones = quote(ProductTombstone._meta.db_table)
+        with connection.cursor() as cursor:
+            # the change feed still owes its readers these deletions
+            cursor.execute(
+                f"INSERT INTO {tombstones} ({quote('product_id')}, "
+                f"{quote('deleted_at')}) "
+                f"SELECT {quote('id')}, %s FROM {quote(Product._meta.db_table)}",
+                [timezone.now()],
+            )
+            # raw DELETEs: going through the ORM would load every row to send
+            # post_delete signals
+            for model in models:
+                cursor.execute(f"DELETE FROM {quote(model._meta.db_table)}")
+        # the incremental jobs start over on their next run
+        JobCheckpoint.objects.filter(
+            name__in=[POPULARITY_CHECKPOINT, BOUGHT_TOGETHER_CHECKPOINT]
+        ).delete()
+        return models
+
+    def reference_data(self) -> dict:
+        """Users, categories and attributes the products point at (ids only)."""
         # ---- Users (for reviews) ----
         User = get_user_model()
         demo_users = []
         for i in range(3):
-            email = f"user{i+1}@example.com"
+            email = f"user{i + 1}@example.com"
             user, _ = User.objects.get_or_create(
                 email=email,
                 defaults={
@@ -76,110 +362,28 @@ class Command(BaseCommand):
                     else email.split("@")[0]
                 },
             )
-            demo_users.append(user)
+            demo_users.append(user.pk)
 
-        # ---- Categories (flat) ----
+        # ---- Categories (two levels; products go to the leaves) ----
         self.stdout.write("Creating categories…")
-        cat_names = ["Shoes", "Tops", "Bottoms", "Accessories", "Bags", "Watches"]
         categories = []
-        for name in cat_names:
-            cat, _ = Category.objects.get_or_create(name=name)
-            categories.append(cat)
+        for name, children in CATEGORY_TREE.items():
+            parent = Category.objects.get_or_create(name=name)[0]
+            if not children:
+                categories.append(parent.pk)
+            for child in children:
+                categories.append(
+                    Category.objects.get_or_create(
+                        name=child, defaults={"parent": parent}
+                    )[0].pk
+                )
 
         # ---- Attributes ----
         self.stdout.write("Creating attributes…")
-        attr_color, _ = Attribute.objects.get_or_create(name="Color")
-        attr_size, _ = Attribute.objects.get_or_create(name="Size")
-        attr_material, _ = Attribute.objects.get_or_create(name="Material")
-
-        # ---- Products + Images + Attributes + Reviews ----
-        self.stdout.write("Creating products…")
-        created_products = 0
-        for i in range(product_target):
-            category = random.choice(categories)
-            title = f"{random.choice(ADJS)} {random.choice(NOUNS)}"
-            price = random.randint(1500, 35000)
-            stock_qty = max(0, int(random.gauss(30, 20)))
-
-            product = Product.objects.create(
-                title=title,
-                description=rand_words(40),
-                category=category,
-                is_active=random.random() > 0.05,
-                price=price,
-                stock_quantity=stock_qty,
-            )
-
-            # Images
-            primary_rank = random.randint(0, 2)
-            for rank in range(3):
-                ProductImage.objects.create(
-                    product=product,
-                    url=PLACEHOLDER_IMG.format(seed=f"{product.id.hex[:8]}-{rank}"),
-                    alt=f"{product.title} image {rank+1}",
-                    sort_rank=rank,
-                    is_primary=(rank == primary_rank),
-                )
-
-            # Attributes
-            ProductAttribute.objects.create(
-                product=product,
-                attribute=attr_color,
-                value_text=random.choice(COLORS),
-                sort_rank=10,
-            )
-            ProductAttribute.objects.create(
-                product=product,
-                attribute=attr_size,
-                value_text=random.choice(SIZES),
-                sort_rank=20,
-            )
-            ProductAttribute.objects.create(
-                product=product,
-                attribute=attr_material,
-                value_text=random.choice(MATERIALS),
-                sort_rank=30,
-            )
-
-            # Reviews
-            for r in range(random.randint(0, 5)):
-                use_fk_author = random.random() < 0.6 and demo_users
-                author = random.choice(demo_users) if use_fk_author else None
-                author_name = (
-                    ""
-                    if author
-                    else f"{random.choice(['Alex','Sam','Jamie','Taylor','Kai','Mika'])} {random.choice(['S.','K.','R.','M.','A.'])}"
-                )
-                created_at = timezone.now() - timedelta(days=random.randint(0, 365))
-                Review.objects.create(
-                    product=product,
-                    rating=random.randint(1, 5),
-                    title=random.choice(
-                        [
-                            "Great!",
-                            "Love it",
-                            "Solid value",
-                            "Not bad",
-                            "Could be better",
-                            "",
-                        ]
-                    ),
-                    body=rand_words(50),
-                    author=author,
-                    author_name=author_name,
-                    created_at=created_at,
-                    updated_at=created_at,
-                )
-
-            created_products += 1
-
-        self.stdout.write(
-            self.style.SUCCESS(f"✔ Seed complete: {created_products} products")
-        )
-        self.stdout.write(
-            f"Categories: {Category.objects.count()}, "
-            f"Attributes: {Attribute.objects.count()}, "
-            f"Products: {Product.objects.count()}, "
-            f"Images: {ProductImage.objects.count()}, "
-            f"Reviews: {Review.objects.count()}"
-        )
+        return {
+            "users": demo_users,
+            "categories": categories,
+            "color": Attribute.objects.get_or_create(name="Color")[0].pk,
+            "size": Attribute.objects.get_or_create(name="Size")[0].pk,
+            "material": Attribute.objects.get_or_create(name="Material")[0].pk,
+        }
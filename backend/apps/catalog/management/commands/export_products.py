@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.catalog.exporter import export_products
+
+
+class Command(BaseCommand):
+    help = "Stream every active product (with images and attributes) as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="fmt",
+            choices=["csv", "ndjson"],
+            default="ndjson",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Destination file (default: stdout).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Products per cursor fetch / prefetch round.",
+        )
+
+    def handle(self, *args, **opts):
+        lines = export_products(opts["fmt"], chunk_size=max(1, opts["chunk_size"]))
+        if opts["output"] == "-":
+            sys.stdout.writelines(lines)
+            return
+
+        total = 0
+        with open(opts["output"], "w", encoding="utf-8", newline="") as out:
+            for line in lines:
+                out.write(line)
+                total += 1
+        if opts["fmt"] == "csv":
+            total -= 1  # header
+        self.stdout.write(
+            self.style.SUCCESS(f"✔ Exported {total} products to {opts['output']}")
+        )
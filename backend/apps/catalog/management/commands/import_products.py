@@ -0,0 +1,60 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.importer import ImportFormatError, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products, images and attributes from a CSV or NDJSON feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            dest="fmt",
+            choices=["csv", "ndjson"],
+            help="Feed format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows per transaction / bulk upsert.",
+        )
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        if path == "-" and not opts["fmt"]:
+            raise CommandError("--format is required when reading stdin.")
+        try:
+            fmt = detect_format(path, opts["fmt"])
+            if path == "-":
+                report = self.run(sys.stdin, fmt, opts["chunk_size"])
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as stream:
+                    report = self.run(stream, fmt, opts["chunk_size"])
+        except (ImportFormatError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for entry in report["errors"]:
+            self.stderr.write(f"  {json.dumps(entry)}")
+        style = self.style.SUCCESS if not report["failed"] else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"✔ Imported {report['imported']} of {report['rows']} rows "
+                f"({report['failed']} failed)"
+            )
+        )
+
+    def run(self, stream, fmt, chunk_size):
+        def progress(report):
+            self.stdout.write(
+                f"  chunk {report['chunks']}: {report['imported']} imported, "
+                f"{report['failed']} failed"
+            )
+
+        return import_products(
+            stream, fmt, chunk_size=max(1, chunk_size), on_chunk=progress
+        )
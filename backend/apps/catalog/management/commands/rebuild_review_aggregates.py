@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.services import rebuild_review_aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Product rating aggregates (avg, count, 1-5 histogram) from reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products per aggregate/bulk_update round trip.",
+        )
+
+    def handle(self, *args, **opts):
+        total = rebuild_review_aggregates(batch_size=max(1, opts["batch_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"✔ Rebuilt aggregates for {total} products")
+        )
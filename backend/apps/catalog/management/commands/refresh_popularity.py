@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = "Fold new order lines into the 24h/7d/30d product popularity counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recount every window from scratch instead of sliding them.",
+        )
+
+    def handle(self, *args, **opts):
+        stats = refresh_popularity(rebuild=opts["rebuild"])
+        mode = "Rebuilt" if stats["rebuilt"] else "Refreshed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✔ {mode} popularity up to {stats['until']:%Y-%m-%d %H:%M:%S}: "
+                f"{stats['products']} products ranked, {stats['dropped']} dropped, "
+                f"{stats['recounted']} recounted after cancellations"
+            )
+        )
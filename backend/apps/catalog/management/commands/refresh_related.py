@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.models import RelatedProduct
+from apps.catalog.related import TOP_K, refresh_bought_together, refresh_similar
+
+
+class Command(BaseCommand):
+    help = "Recompute related products: bought together (incremental) and similar."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=RelatedProduct.Kind.values,
+            action="append",
+            help="Only refresh this kind (repeatable); default: all.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recount every order instead of only the ones since the last run.",
+        )
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=TOP_K,
+            help="Related products kept per product.",
+        )
+
+    def handle(self, *args, **opts):
+        kinds = opts["kind"] or RelatedProduct.Kind.values
+        k = max(1, opts["top_k"])
+
+        if RelatedProduct.Kind.BOUGHT_TOGETHER in kinds:
+            stats = refresh_bought_together(rebuild=opts["rebuild"], k=k)
+            mode = "Rebuilt" if stats["rebuilt"] else "Refreshed"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✔ {mode} bought-together up to "
+                    f"{stats['until']:%Y-%m-%d %H:%M:%S}: "
+                    f"{stats['pairs']} pairs changed, {stats['products']} products "
+                    f"re-ranked ({stats['related']} related rows), "
+                    f"{stats['recounted']} recounted after cancellations"
+                )
+            )
+
+        if RelatedProduct.Kind.SIMILAR in kinds:
+            stats = refresh_similar(k=k)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✔ Rebuilt similar products: {stats['products']} products "
+                    f"in {stats['groups']} groups, "
+                    f"{stats['features']} features ({stats['related']} related rows)"
+                )
+            )
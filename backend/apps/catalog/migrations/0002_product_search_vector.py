@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:20
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# PostgreSQL only: keep catalog_product.search_vector in sync from title/description
+# (also covers bulk_create / queryset.update) and index it with GIN.
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION catalog_product_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER catalog_product_search_vector_trg
+    BEFORE INSERT OR UPDATE OF title, description ON catalog_product
+    FOR EACH ROW EXECUTE FUNCTION catalog_product_search_vector_update();
+    """,
+    "UPDATE catalog_product SET title = title;",
+    "CREATE INDEX ix_product_search ON catalog_product USING gin (search_vector);",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS ix_product_search;",
+    "DROP TRIGGER IF EXISTS catalog_product_search_vector_trg ON catalog_product;",
+    "DROP FUNCTION IF EXISTS catalog_product_search_vector_update();",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,36 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# PostgreSQL only: trigram GIN indexes backing /products/suggest/
+INDEXES = [
+    ("ix_product_title_trgm", "catalog_product", "title"),
+    ("ix_category_name_trgm", "catalog_category", "name"),
+]
+
+FORWARD_SQL = [
+    f"CREATE INDEX {name} ON {table} USING gin ({column} gin_trgm_ops);"
+    for name, table, column in INDEXES
+]
+
+REVERSE_SQL = [f"DROP INDEX IF EXISTS {name};" for name, _, _ in INDEXES]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0002_product_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
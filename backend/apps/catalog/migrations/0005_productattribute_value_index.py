@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0004_product_review_aggregates"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="productattribute",
+            name="ix_productattr_attribute",
+        ),
+        migrations.AddIndex(
+            model_name="productattribute",
+            index=models.Index(
+                fields=["attribute", "value_text", "product"],
+                name="ix_productattr_value",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0006_product_change_feed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductPopularity",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity_counts",
+                        serialize=False,
+                        to="catalog.product",
+                    ),
+                ),
+                ("sold_24h", models.PositiveIntegerField(default=0)),
+                ("sold_7d", models.PositiveIntegerField(default=0)),
+                ("sold_30d", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0008_related_products"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="relatedproduct",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("bought_together", "Frequently bought together"),
+                    ("similar", "Similar products"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
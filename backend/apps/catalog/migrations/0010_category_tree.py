@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def root_paths(apps, schema_editor):
+    # every existing category becomes a root
+    Category = apps.get_model("catalog", "Category")
+    categories = list(Category.objects.using(schema_editor.connection.alias).all())
+    for category in categories:
+        category.path = f"{category.pk.hex}/"
+    Category.objects.using(schema_editor.connection.alias).bulk_update(
+        categories, ["path"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0009_related_product_similar"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="category",
+            options={"ordering": ["path"]},
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="children",
+                to="catalog.category",
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(default="", editable=False, max_length=1024),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["path"],
+                name="ix_category_path",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
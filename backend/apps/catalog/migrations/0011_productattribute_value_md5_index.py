@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:37
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0010_category_tree"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="productattribute",
+            name="ix_productattr_value",
+        ),
+        migrations.AddIndex(
+            model_name="productattribute",
+            index=models.Index(
+                models.F("attribute"),
+                django.db.models.functions.text.MD5("value_text"),
+                models.F("product"),
+                name="ix_productattr_value",
+            ),
+        ),
+    ]
@@ -1,18 +1,100 @@
 import uuid
-from django.db import models
-from django.db.models import Q, F
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import MD5, Concat, Substr
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from apps.common.models import TimeStampedModel
 
 
 class Category(TimeStampedModel):
+    """
+    Category tree as a materialized path: `path` is the ids of the root ..
+    self, so a subtree is one `path LIKE '<path>%'` range on ix_category_path.
+    Kept up to date by save(), which rewrites a moved subtree in one UPDATE.
+    """
+
+    PATH_SEPARATOR = "/"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=160, unique=True)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        related_name="children",
+        null=True,
+        blank=True,
+    )
+    path = models.CharField(max_length=1024, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ["path"]
+        indexes = [
+            # LIKE 'prefix%' needs pattern ops under a non-C collation
+            models.Index(
+                fields=["path"],
+                name="ix_category_path",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def new_root(cls, **fields) -> "Category":
+        """Unsaved top-level category with its path filled in, for bulk_create."""
+        category = cls(**fields)
+        category.path = f"{category.pk.hex}{cls.PATH_SEPARATOR}"
+        return category
+
+    def is_ancestor_of(self, other) -> bool:
+        return bool(self.path) and other.path.startswith(self.path)
+
+    def clean(self):
+        if self.parent_id and self.is_ancestor_of(self.parent):
+            raise ValidationError(
+                {"parent": "A category cannot be moved under itself."}
+            )
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(Category, instance=self)
+        with transaction.atomic(using=using):
+            # current paths from the database, not from possibly stale instances
+            stored = dict(
+                Category.objects.using(using)
+                .select_for_update()
+                .filter(pk__in=[self.pk, self.parent_id])
+                .values_list("pk", "path")
+            )
+            old_path = stored.get(self.pk, "")
+            parent_path = stored.get(self.parent_id, "")
+            self.path = f"{parent_path}{self.pk.hex}{self.PATH_SEPARATOR}"
+            self.depth = parent_path.count(self.PATH_SEPARATOR)
+            if old_path and old_path != self.path and self.path.startswith(old_path):
+                raise ValidationError(
+                    {"parent": "A category cannot be moved under itself."}
+                )
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "path", "depth"}
+            super().save(*args, **kwargs)
+
+            if old_path and old_path != self.path:
+                # moved: re-root every descendant with one UPDATE
+                Category.objects.using(using).filter(path__startswith=old_path).exclude(
+                    pk=self.pk
+                ).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1)),
+                    depth=F("depth")
+                    + self.depth
+                    - (old_path.count(self.PATH_SEPARATOR) - 1),
+                    updated_at=timezone.now(),
+                )
+
 
 class Product(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -38,6 +120,18 @@ class Product(TimeStampedModel):
         validators=[MinValueValidator(0)],
         help_text="Number of items in stock",
     )
+    # maintained by a DB trigger on PostgreSQL (see migration 0002); unused elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # review aggregates, kept in sync by apps.catalog.signals
+    # (rebuild with `manage.py rebuild_review_aggregates`)
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
@@ -46,6 +140,9 @@ class Product(TimeStampedModel):
                 fields=["category", "is_active"], name="ix_product_cat_active"
             ),
             models.Index(fields=["is_active", "price"], name="ix_product_active_price"),
+            models.Index(fields=["rating_avg", "id"], name="ix_product_rating"),
+            # change feed: WHERE (updated_at, id) > cursor ORDER BY updated_at, id
+            models.Index(fields=["updated_at", "id"], name="ix_product_updated"),
         ]
         constraints = [
             models.CheckConstraint(
@@ -54,6 +151,10 @@ class Product(TimeStampedModel):
             ),
         ]
 
+    @property
+    def rating_histogram(self) -> dict[str, int]:
+        return {str(star): getattr(self, f"rating_{star}") for star in range(1, 6)}
+
     # Stock methods
     @property
     def in_stock(self) -> bool:
@@ -62,20 +163,22 @@ class Product(TimeStampedModel):
     def decrement_stock(self, qty: int = 1) -> int:
         if qty <= 0:
             return 0
-        updated = Product.objects.filter(pk=self.pk, stock_quantity__gte=qty).update(
-            stock_quantity=F("stock_quantity") - qty
-        )
-        if updated:
-            self.refresh_from_db(fields=["stock_quantity"])
-        return updated
+        return self._adjust_stock(-qty)
 
     def increment_stock(self, qty: int = 1) -> None:
         if qty <= 0:
             return
-        Product.objects.filter(pk=self.pk).update(
-            stock_quantity=F("stock_quantity") + qty
-        )
-        self.refresh_from_db(fields=["stock_quantity"])
+        self._adjust_stock(qty)
+
+    def _adjust_stock(self, delta: int) -> int:
+        # services imports this module
+        from apps.catalog.services import StockAdjustment, adjust_stock
+
+        # one guarded UPDATE ... RETURNING; no refresh_from_db round trip
+        (result,) = adjust_stock([StockAdjustment(self.pk, delta=delta)])
+        if result.ok:
+            self.stock_quantity = result.stock_quantity
+        return int(result.ok)
 
 
 class ProductImage(TimeStampedModel):
@@ -140,7 +243,14 @@ class ProductAttribute(TimeStampedModel):
             ),
         ]
         indexes = [
-            models.Index(fields=["attribute"], name="ix_productattr_attribute"),
+            # attribute-value filtering: (attribute, value) -> product ids;
+            # on md5(value): a btree entry must fit in ~2.7 kB, value_text needn't
+            models.Index(
+                F("attribute"),
+                MD5("value_text"),
+                F("product"),
+                name="ix_productattr_value",
+            ),
         ]
 
     def __str__(self):
@@ -187,3 +297,94 @@ class Review(TimeStampedModel):
 
     def __str__(self):
         return f"Review {self.rating}★ on {self.product}"
+
+
+class ProductTombstone(models.Model):
+    """Deletion log for the change feed (see apps.catalog.changes)."""
+
+    product_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["deleted_at", "id"]
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="ix_tombstone_deleted"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class ProductPopularity(models.Model):
+    """
+    Units ordered per product over rolling windows, maintained incrementally
+    by `manage.py refresh_popularity` (apps.catalog.popularity). Products
+    without recent orders have no row.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity_counts",
+    )
+    sold_24h = models.PositiveIntegerField(default=0)
+    sold_7d = models.PositiveIntegerField(default=0)
+    sold_30d = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.sold_24h}/{self.sold_7d}/{self.sold_30d}"
+
+
+class ProductCooccurrence(models.Model):
+    """
+    How many orders contained both `product` and `other`. Stored in both
+    directions so a product's partners are one index range.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "other"], name="uq_cooccurrence_pair"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.orders}"
+
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed top-K recommendations per product, rank 0 first, rebuilt by
+    offline jobs (apps.catalog.related).
+    """
+
+    class Kind(models.TextChoices):
+        BOUGHT_TOGETHER = "bought_together", "Frequently bought together"
+        SIMILAR = "similar", "Similar products"
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="related_products"
+    )
+    related = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="related_to"
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["product", "kind", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "kind", "rank"], name="uq_related_product_rank"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -[{self.kind}#{self.rank}]-> {self.related_id}"
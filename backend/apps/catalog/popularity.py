@@ -0,0 +1,122 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.catalog.models import ProductPopularity
+from apps.common.cache import bump_model_version
+from apps.common.models import JobCheckpoint
+from apps.orders.models import Order, OrderItem
+
+CHECKPOINT = "catalog.popularity"
+WINDOWS = {
+    "sold_24h": timedelta(hours=24),
+    "sold_7d": timedelta(days=7),
+    "sold_30d": timedelta(days=30),
+}
+# created_at is stamped before commit; lines younger than this may still be
+# in flight, so the job only folds in what is older
+COMMIT_LAG = timedelta(seconds=30)
+
+
+def _cancelled_products(start, end) -> set:
+    """Products on orders cancelled (last saved) in (start, end]."""
+    return set(
+        OrderItem.objects.filter(
+            order__status=Order.Status.CANCELLED,
+            order__updated_at__gt=start,
+            order__updated_at__lte=end,
+        ).values_list("product_id", flat=True)
+    )
+
+
+def _units(start, end, product_ids=None) -> dict:
+    """{product_id: units} over live order lines created in (start, end]."""
+    lines = OrderItem.objects.filter(created_at__gt=start, created_at__lte=end).exclude(
+        order__status=Order.Status.CANCELLED
+    )
+    if product_ids is not None:
+        lines = lines.filter(product_id__in=product_ids)
+    return dict(
+        lines.order_by()
+        .values("product_id")
+        .annotate(units=Sum("quantity"))
+        .values_list("product_id", "units")
+    )
+
+
+@transaction.atomic
+def refresh_popularity(rebuild: bool = False, batch_size: int = 1000) -> dict:
+    """
+    Slide each window from the checkpoint to now: for a window W moving from
+    t0 to t1, add the lines created in (t0, t1] and subtract those created in
+    (t0 - W, t1 - W]. Only lines entering or leaving a window are read, via
+    the OrderItem.created_at index. Lines of cancelled orders don't count;
+    products on an order cancelled since the checkpoint have their windows
+    recounted instead, since their lines may already be in them. The first
+    run (or `rebuild`) counts each window from scratch.
+    """
+    now = timezone.now() - COMMIT_LAG
+    checkpoint = (
+        JobCheckpoint.objects.select_for_update().filter(name=CHECKPOINT).first()
+    )
+    fresh = rebuild or checkpoint is None
+
+    deltas = defaultdict(lambda: dict.fromkeys(WINDOWS, 0))
+    recount = set()
+    if fresh:
+        ProductPopularity.objects.all().delete()
+        for field, window in WINDOWS.items():
+            for product_id, units in _units(now - window, now).items():
+                deltas[product_id][field] += units
+    else:
+        since = checkpoint.position
+        entered = _units(since, now)
+        for field, window in WINDOWS.items():
+            for product_id, units in entered.items():
+                deltas[product_id][field] += units
+            for product_id, units in _units(since - window, now - window).items():
+                deltas[product_id][field] -= units
+
+        # a cancellation is stamped on the order, not its lines; counting
+        # those products afresh is idempotent however often the order is saved
+        recount = _cancelled_products(since, now)
+        for product_id in recount:
+            deltas[product_id] = dict.fromkeys(WINDOWS, 0)
+        if recount:
+            for field, window in WINDOWS.items():
+                for product_id, units in _units(now - window, now, recount).items():
+                    deltas[product_id][field] = units
+
+    current = ProductPopularity.objects.in_bulk(list(deltas))
+    rows, emptied = [], []
+    for product_id, delta in deltas.items():
+        row = current.get(product_id) or ProductPopularity(product_id=product_id)
+        for field, change in delta.items():
+            if product_id not in recount:
+                change += getattr(row, field)
+            setattr(row, field, change)
+        if any(getattr(row, field) for field in WINDOWS):
+            rows.append(row)
+        elif product_id in current:
+            emptied.append(product_id)
+
+    ProductPopularity.objects.filter(pk__in=emptied).delete()
+    ProductPopularity.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=[*WINDOWS, "updated_at"],
+    )
+    JobCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={"position": now})
+    bump_model_version(ProductPopularity)
+    return {
+        "until": now,
+        "rebuilt": fresh,
+        "products": len(rows),
+        "dropped": len(emptied),
+        "recounted": len(recount),
+    }
@@ -0,0 +1,481 @@
+"""
+Offline product recommendations, stored as ranked RelatedProduct rows so the
+API serves them with one index range scan.
+
+Frequently bought together: order lines form a sparse order x product
+matrix X, and X^T X counts, for every product pair, the orders containing
+both. Pair counts are kept in ProductCooccurrence; each run folds in only
+the orders placed since the last one and re-ranks the products they touched.
+Cancelled orders don't count: products on an order cancelled after it was
+counted have their pairs recounted.
+
+Similar products: every active product becomes a sparse one-hot row over
+its category, price band and attribute values, and its nearest neighbours
+by cosine similarity are found among the products of its category (and
+price band, in large categories), so the work grows with the category
+sizes rather than the catalogue's. No sales history needed, so new
+products get recommendations on the next run.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from scipy import sparse
+
+from apps.catalog.models import (
+    Product,
+    ProductAttribute,
+    ProductCooccurrence,
+    RelatedProduct,
+)
+from apps.common.cache import bump_model_version
+from apps.common.models import JobCheckpoint
+from apps.orders.models import Order, OrderItem
+
+BOUGHT_TOGETHER_CHECKPOINT = "catalog.related.bought_together"
+TOP_K = 12
+# orders are created before commit; ones younger than this may still be in
+# flight, so the job only folds in what is older
+COMMIT_LAG = timedelta(seconds=30)
+# order lines per sparse product; batches end on order boundaries
+LINES_PER_BATCH = 200_000
+WRITE_BATCH_SIZE = 1000
+# relative weight of each feature group in the similarity
+SIMILARITY_WEIGHTS = {"category": 2.0, "price": 1.0, "attribute": 1.0}
+# price quantiles: a product is only "near in price" to its own band
+PRICE_BANDS = 8
+# similar products are looked for within a category; one larger than this
+# is split by price band
+SIMILARITY_GROUP_SIZE = 5000
+# dense similarity scores held at once (8 bytes each)
+SIMILARITY_BLOCK_CELLS = 10_000_000
+
+
+def top_k(rows, cols, scores, k: int):
+    """
+    Positions of the `k` best-scored entries of each row, best first (ties
+    to the lower column), and their rank within the row.
+    """
+    order = np.lexsort((cols, -scores, rows))
+    if not len(order):
+        return order, order
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, sizes)
+    keep = rank < k
+    return order[keep], rank[keep]
+
+
+def count_pairs(lines, products: dict, batch_lines: int = LINES_PER_BATCH):
+    """
+    Orders per product pair over `lines`, (order id, product id) tuples
+    sorted by order: an n x n CSR matrix, both directions, empty diagonal.
+    `products` maps product id -> row/column and grows as ids show up.
+    """
+    parts = []
+
+    def flush(order_codes, product_codes):
+        basket = sparse.csr_matrix(
+            (
+                np.ones(len(order_codes), dtype=np.int32),
+                (order_codes, product_codes),
+            ),
+            shape=(order_codes[-1] + 1, len(products)),
+        )
+        pairs = (basket.T @ basket).tocoo()
+        off_diagonal = pairs.row != pairs.col
+        parts.append(
+            (
+                pairs.row[off_diagonal],
+                pairs.col[off_diagonal],
+                pairs.data[off_diagonal],
+            )
+        )
+
+    order_codes, product_codes = [], []
+    last_order, order_code = None, -1
+    for order_id, product_id in lines:
+        if order_id != last_order:
+            if len(order_codes) >= batch_lines:
+                flush(order_codes, product_codes)
+                order_codes, product_codes, order_code = [], [], -1
+            last_order = order_id
+            order_code += 1
+        order_codes.append(order_code)
+        product_codes.append(products.setdefault(product_id, len(products)))
+    if order_codes:
+        flush(order_codes, product_codes)
+
+    n = len(products)
+    if not parts:
+        return sparse.csr_matrix((n, n), dtype=np.int64)
+    rows, cols, counts = (np.concatenate(column) for column in zip(*parts))
+    # earlier batches had fewer columns; coo -> csr sums repeated pairs
+    return sparse.coo_matrix(
+        (counts.astype(np.int64), (rows, cols)), shape=(n, n)
+    ).tocsr()
+
+
+def add_pair_counts(pairs, ids: list) -> None:
+    """Upsert `pairs` (CSR over `ids`) as increments of the stored counts."""
+    pairs = pairs.tocoo()
+    connection = connections[router.db_for_write(ProductCooccurrence)]
+    quote = connection.ops.quote_name
+    table = quote(ProductCooccurrence._meta.db_table)
+    product, other, orders = (
+        quote(ProductCooccurrence._meta.get_field(name).column)
+        for name in ("product", "other", "orders")
+    )
+    prep = Product._meta.pk.get_db_prep_value
+    db_ids = [prep(pk, connection) for pk in ids]
+
+    rows, cols, counts = pairs.row.tolist(), pairs.col.tolist(), pairs.data.tolist()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            stop = start + WRITE_BATCH_SIZE
+            batch = list(zip(rows[start:stop], cols[start:stop], counts[start:stop]))
+            params = []
+            for row, col, count in batch:
+                params += [db_ids[row], db_ids[col], count]
+            values = ", ".join(["(%s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({product}, {other}, {orders}) "
+                f"VALUES {values} "
+                f"ON CONFLICT ({product}, {other}) "
+                f"DO UPDATE SET {orders} = {table}.{orders} + EXCLUDED.{orders}",
+                params,
+            )
+
+
+def replace_related(kind: str, product_ids, rows, cols, scores, ids, k: int) -> int:
+    """
+    Store the top `k` of each row as `kind` recommendations of `product_ids`
+    (rows/cols index `ids`), replacing what those products had.
+    """
+    # ties go to the lower product id, whatever codes this run handed out
+    id_order = np.argsort(np.argsort(np.array(ids, dtype=object)))
+    keep, rank = top_k(rows, id_order[cols], scores, k)
+    RelatedProduct.objects.filter(kind=kind, product_id__in=product_ids).delete()
+    RelatedProduct.objects.bulk_create(
+        [
+            RelatedProduct(
+                product_id=ids[row],
+                related_id=ids[col],
+                kind=kind,
+                rank=position,
+                score=score,
+            )
+            for row, col, score, position in zip(
+                rows[keep].tolist(),
+                cols[keep].tolist(),
+                scores[keep].tolist(),
+                rank.tolist(),
+            )
+        ],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+    return len(keep)
+
+
+def recount_pairs(product_ids, lines, batch_lines: int = LINES_PER_BATCH) -> set:
+    """
+    Replace the stored pair counts of `product_ids` with a recount over
+    `lines` (an OrderItem queryset). Returns every product whose counts may
+    have changed: those, and their old and new partners.
+    """
+    product_ids = set(product_ids)
+    changed = product_ids | set(
+        ProductCooccurrence.objects.filter(product_id__in=product_ids).values_list(
+            "other_id", flat=True
+        )
+    )
+    ProductCooccurrence.objects.filter(
+        Q(product_id__in=product_ids) | Q(other_id__in=product_ids)
+    ).delete()
+
+    baskets = (
+        lines.filter(
+            order__in=OrderItem.objects.filter(product_id__in=product_ids).values(
+                "order_id"
+            )
+        )
+        .order_by("order_id")
+        .values_list("order_id", "product_id")
+        .iterator(chunk_size=10_000)
+    )
+    products = {}
+    pairs = count_pairs(baskets, products, batch_lines).tocoo()
+    ids = list(products)
+    # the baskets count every pair of theirs, but only pairs with one of
+    # `product_ids` are complete
+    mine = np.array([product_id in product_ids for product_id in ids], dtype=bool)
+    keep = mine[pairs.row] | mine[pairs.col]
+    pairs = sparse.coo_matrix(
+        (pairs.data[keep], (pairs.row[keep], pairs.col[keep])), shape=pairs.shape
+    )
+    add_pair_counts(pairs, ids)
+    changed.update(ids[code] for code in np.unique(pairs.row).tolist())
+    return changed
+
+
+def _stored_pairs(product_ids):
+    """Stored pair counts of `product_ids` as (rows, cols, counts, ids)."""
+    codes = {}
+    rows, cols, counts = [], [], []
+    for product_id, other_id, orders in ProductCooccurrence.objects.filter(
+        product_id__in=product_ids
+    ).values_list("product_id", "other_id", "orders"):
+        rows.append(codes.setdefault(product_id, len(codes)))
+        cols.append(codes.setdefault(other_id, len(codes)))
+        counts.append(orders)
+    return (
+        np.array(rows, dtype=np.int64),
+        np.array(cols, dtype=np.int64),
+        np.array(counts, dtype=np.int64),
+        list(codes),
+    )
+
+
+@transaction.atomic
+def refresh_bought_together(
+    rebuild: bool = False, k: int = TOP_K, batch_lines: int = LINES_PER_BATCH
+) -> dict:
+    """
+    Fold the orders created since the checkpoint into the pair counts and
+    re-rank every product that shares one of them with another product;
+    pairs no new order contains keep their counts and rankings. Orders
+    counted by an earlier run and cancelled since have their products'
+    pairs recounted. The first run (or `rebuild`) counts every order.
+    """
+    until = timezone.now() - COMMIT_LAG
+    kind = RelatedProduct.Kind.BOUGHT_TOGETHER
+    checkpoint = (
+        JobCheckpoint.objects.select_for_update()
+        .filter(name=BOUGHT_TOGETHER_CHECKPOINT)
+        .first()
+    )
+    fresh = rebuild or checkpoint is None
+
+    live = OrderItem.objects.exclude(order__status=Order.Status.CANCELLED)
+    lines = live.filter(order__created_at__lte=until)
+    recounted = set()
+    if fresh:
+        ProductCooccurrence.objects.all().delete()
+        RelatedProduct.objects.filter(kind=kind).delete()
+    else:
+        since = checkpoint.position
+        lines = lines.filter(order__created_at__gt=since)
+        # a cancellation is stamped on the order, not its lines; recounting
+        # is idempotent however often the order is saved
+        cancelled = set(
+            OrderItem.objects.filter(
+                order__status=Order.Status.CANCELLED,
+                order__created_at__lte=since,
+                order__updated_at__gt=since,
+                order__updated_at__lte=until,
+            ).values_list("product_id", flat=True)
+        )
+        if cancelled:
+            recounted = recount_pairs(
+                cancelled, live.filter(order__created_at__lte=since), batch_lines
+            )
+    lines = (
+        lines.order_by("order_id")
+        .values_list("order_id", "product_id")
+        .iterator(chunk_size=10_000)
+    )
+
+    products = {}
+    delta = count_pairs(lines, products, batch_lines)
+    ids = list(products)
+    add_pair_counts(delta, ids)
+
+    touched = [ids[code] for code in np.flatnonzero(np.diff(delta.indptr))]
+    touched += recounted.difference(touched)
+    ranked = 0
+    if fresh:
+        # the delta is the whole history: rank straight from memory
+        pairs = delta.tocoo()
+        ranked = replace_related(
+            kind, touched, pairs.row, pairs.col, pairs.data, ids, k
+        )
+    else:
+        for start in range(0, len(touched), WRITE_BATCH_SIZE):
+            chunk = touched[start : start + WRITE_BATCH_SIZE]
+            rows, cols, counts, chunk_ids = _stored_pairs(chunk)
+            ranked += replace_related(kind, chunk, rows, cols, counts, chunk_ids, k)
+
+    JobCheckpoint.objects.update_or_create(
+        name=BOUGHT_TOGETHER_CHECKPOINT, defaults={"position": until}
+    )
+    bump_model_version(RelatedProduct)
+    return {
+        "until": until,
+        "rebuilt": fresh,
+        "pairs": delta.nnz // 2,
+        "products": len(touched),
+        "recounted": len(recounted),
+        "related": ranked,
+    }
+
+
+def price_bands(prices, bands: int = PRICE_BANDS):
+    """Quantile band (0 .. bands - 1) of each of `prices`."""
+    prices = np.asarray(prices, dtype=np.float64)
+    if not len(prices):
+        return np.zeros(0, dtype=np.int64)
+    edges = np.quantile(prices, np.linspace(0, 1, bands + 1)[1:-1])
+    return np.searchsorted(edges, prices, side="right")
+
+
+def product_features(products, attributes, bands: int = PRICE_BANDS):
+    """
+    Row-normalised one-hot features of `products` ((id, category id, price)
+    sorted by id) from their `attributes` ((product id, attribute id,
+    value)): a CSR matrix whose row products are cosine similarities.
+    """
+    codes = {pk: row for row, (pk, _, _) in enumerate(products)}
+    columns = {}
+    rows, cols, weights = [], [], []
+
+    def add(row, feature, weight):
+        rows.append(row)
+        cols.append(columns.setdefault(feature, len(columns)))
+        weights.append(weight)
+
+    prices = [price for _, _, price in products]
+    for row, ((_, category_id, _), band) in enumerate(
+        zip(products, price_bands(prices, bands).tolist())
+    ):
+        add(row, ("category", category_id), SIMILARITY_WEIGHTS["category"])
+        add(row, ("price", band), SIMILARITY_WEIGHTS["price"])
+    for product_id, attribute_id, value in attributes:
+        if product_id in codes:
+            feature = ("attribute", attribute_id, value.strip().casefold())
+            add(codes[product_id], feature, SIMILARITY_WEIGHTS["attribute"])
+
+    features = sparse.csr_matrix(
+        (weights, (rows, cols)), shape=(len(products), len(columns))
+    )
+    # repeated (row, column) pairs were summed: one attribute value listed twice
+    norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+    return sparse.diags(1 / np.maximum(norms, 1e-12)) @ features
+
+
+def similarity_groups(products, bands, max_size: int = SIMILARITY_GROUP_SIZE):
+    """
+    Yield arrays of rows of `products` that are each other's neighbour
+    candidates: one per category, split by `bands` (each product's price
+    band) where the category has more than `max_size` products.
+    """
+    categories = defaultdict(list)
+    for row, (_, category_id, _) in enumerate(products):
+        categories[category_id].append(row)
+    for rows in categories.values():
+        if len(rows) <= max_size:
+            yield np.array(rows)
+            continue
+        by_band = defaultdict(list)
+        for row in rows:
+            by_band[bands[row]].append(row)
+        yield from (np.array(band_rows) for band_rows in by_band.values())
+
+
+def nearest_neighbours(features, k: int, block_cells: int = SIMILARITY_BLOCK_CELLS):
+    """
+    Yield (rows, cols, scores, rank) arrays holding the `k` most similar
+    other rows of each row, best first, a block of rows at a time; a block
+    is scored densely against every row, `block_cells` scores at most.
+    """
+    n = features.shape[0]
+    k = min(k, n - 1)
+    if k < 1:
+        return
+    block_size = max(1, block_cells // n)
+    transposed = features.T.tocsc()
+    # equal scores are common with one-hot features: nudge them apart so
+    # the lower column (product id) wins, far below any real difference
+    nudge = np.arange(n, dtype=np.float64) * (1e-9 / n)
+    for start in range(0, n, block_size):
+        block = (features[start : start + block_size] @ transposed).toarray()
+        rows = np.arange(len(block))
+        block[rows, rows + start] = -np.inf
+        block -= nudge
+        best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(
+            best, np.argsort(-np.take_along_axis(block, best, axis=1), axis=1), axis=1
+        )
+        scores = np.take_along_axis(block, best, axis=1) + nudge[best]
+        keep = scores > 1e-9
+        yield (
+            np.repeat(rows + start, k).reshape(-1, k)[keep],
+            best[keep],
+            scores[keep],
+            np.broadcast_to(np.arange(k), best.shape)[keep],
+        )
+
+
+@transaction.atomic
+def refresh_similar(
+    k: int = TOP_K,
+    block_cells: int = SIMILARITY_BLOCK_CELLS,
+    group_size: int = SIMILARITY_GROUP_SIZE,
+) -> dict:
+    """
+    Recompute the `k` nearest neighbours of every active product, scoring
+    only the products of its similarity group (see similarity_groups()).
+    """
+    kind = RelatedProduct.Kind.SIMILAR
+    products = list(
+        Product.objects.filter(is_active=True)
+        .order_by("pk")
+        .values_list("pk", "category_id", "price")
+    )
+    attributes = ProductAttribute.objects.filter(product__is_active=True).values_list(
+        "product_id", "attribute_id", "value_text"
+    )
+    features = product_features(products, attributes.iterator(chunk_size=10_000))
+    bands = price_bands([price for _, _, price in products]).tolist()
+    ids = [pk for pk, _, _ in products]
+
+    RelatedProduct.objects.filter(kind=kind).delete()
+    related, groups, pending = 0, 0, []
+    for group in similarity_groups(products, bands, group_size):
+        groups += 1
+        # groups keep the rows' pk order, so ties still go to the lower id
+        for rows, cols, scores, rank in nearest_neighbours(
+            features[group], k, block_cells
+        ):
+            pending += [
+                RelatedProduct(
+                    product_id=ids[row],
+                    related_id=ids[col],
+                    kind=kind,
+                    rank=position,
+                    score=score,
+                )
+                for row, col, score, position in zip(
+                    group[rows].tolist(),
+                    group[cols].tolist(),
+                    scores.tolist(),
+                    rank.tolist(),
+                )
+            ]
+            related += len(rows)
+        if len(pending) >= WRITE_BATCH_SIZE:
+            RelatedProduct.objects.bulk_create(pending, batch_size=WRITE_BATCH_SIZE)
+            pending = []
+    RelatedProduct.objects.bulk_create(pending, batch_size=WRITE_BATCH_SIZE)
+
+    bump_model_version(RelatedProduct)
+    return {
+        "products": len(ids),
+        "features": features.shape[1],
+        "groups": groups,
+        "related": related,
+    }
@@ -9,13 +9,22 @@ from apps.catalog.models import (
     ProductAttribute,
     Review,
 )
+from apps.catalog.services import STARS, card_images
+from apps.common.values import ValuesSerializer
 
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ["id", "name", "created_at", "updated_at"]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        fields = ["id", "name", "parent", "depth", "created_at", "updated_at"]
+        read_only_fields = ["id", "depth", "created_at", "updated_at"]
+
+    def validate_parent(self, parent):
+        if parent and self.instance and self.instance.is_ancestor_of(parent):
+            raise serializers.ValidationError(
+                "A category cannot be moved under itself."
+            )
+        return parent
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -86,6 +95,9 @@ class ProductSerializer(serializers.ModelSerializer):
 
     # expose model property
     in_stock = serializers.BooleanField(read_only=True)
+    rating_histogram = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
 
     class Meta:
         model = Product
@@ -99,6 +111,9 @@ class ProductSerializer(serializers.ModelSerializer):
             "price",
             "stock_quantity",
             "in_stock",
+            "rating_avg",
+            "rating_count",
+            "rating_histogram",
             "images",
             "attributes",
             "created_at",
@@ -109,4 +124,200 @@ class ProductSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "in_stock",
+            "rating_avg",
+            "rating_count",
         ]
+
+
+class ProductCardImageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductImage
+        fields = ["id", "url", "alt"]
+        read_only_fields = fields
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    Lean list-mode representation (product cards). Expects the queryset from
+    services.product_card_queryset(), i.e. `card_images` prefetched.
+    """
+
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    primary_image = serializers.SerializerMethodField()
+    in_stock = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "title",
+            "category",
+            "category_name",
+            "is_active",
+            "price",
+            "stock_quantity",
+            "in_stock",
+            "rating_avg",
+            "rating_count",
+            "primary_image",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+    def get_primary_image(self, obj):
+        images = getattr(obj, "card_images", None)
+        if images is None:
+            # not prefetched (e.g. serialized outside the list view)
+            images = obj.images.order_by("-is_primary", "sort_rank", "id")[:1]
+        image = next(iter(images), None)
+        if image is None:
+            return None
+        return ProductCardImageSerializer(image).data
+
+
+# ---- values-based mirrors for read-only lists (apps.common.values) ----
+class ProductImageValuesSerializer(ValuesSerializer):
+    serializer_class = ProductImageSerializer
+
+
+class ProductAttributeValuesSerializer(ValuesSerializer):
+    serializer_class = ProductAttributeSerializer
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    """ProductSerializer from rows: 3 queries for any number of products."""
+
+    serializer_class = ProductSerializer
+    computed = ("in_stock", "rating_histogram", "images", "attributes")
+    extra_columns = tuple(f"rating_{star}" for star in STARS)
+
+    def fetch_related(self, rows):
+        ids = [row["id"] for row in rows]
+        images = ProductImageValuesSerializer()
+        attributes = ProductAttributeValuesSerializer()
+        return {
+            "images": images.serialize_by(
+                images.values(
+                    ProductImage.objects.filter(product_id__in=ids).order_by(
+                        "sort_rank", "id"
+                    )
+                ),
+                "product",
+            ),
+            "attributes": attributes.serialize_by(
+                attributes.values(ProductAttribute.objects.filter(product_id__in=ids)),
+                "product",
+            ),
+        }
+
+    def get_in_stock(self, row, related):
+        return row["stock_quantity"] > 0
+
+    def get_rating_histogram(self, row, related):
+        return {str(star): row[f"rating_{star}"] for star in STARS}
+
+    def get_images(self, row, related):
+        return related["images"].get(row["id"], [])
+
+    def get_attributes(self, row, related):
+        return related["attributes"].get(row["id"], [])
+
+
+class ProductCardImageValuesSerializer(ValuesSerializer):
+    serializer_class = ProductCardImageSerializer
+
+
+class ProductCardValuesSerializer(ValuesSerializer):
+    """ProductCardSerializer from rows: 2 queries per page."""
+
+    serializer_class = ProductCardSerializer
+    computed = ("in_stock", "primary_image")
+
+    def fetch_related(self, rows):
+        images = ProductCardImageValuesSerializer()
+        return images.serialize_by(
+            images.values(card_images([row["id"] for row in rows]), "product_id"),
+            "product_id",
+        )
+
+    def get_in_stock(self, row, related):
+        return row["stock_quantity"] > 0
+
+    def get_primary_image(self, row, related):
+        images = related.get(row["id"])
+        return images[0] if images else None
+
+
+class SuggestQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=8)
+
+
+class FacetQuerySerializer(serializers.Serializer):
+    price_buckets = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class ImportImageSerializer(serializers.Serializer):
+    url = serializers.URLField(max_length=600)
+    alt = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    is_primary = serializers.BooleanField(default=False)
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    One complete product record of an import feed (apps.catalog.importer).
+    Identified by `id`, or by `sku` which maps to a stable uuid5.
+    """
+
+    id = serializers.UUIDField(required=False)
+    sku = serializers.CharField(max_length=100, required=False)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    category = serializers.CharField(max_length=160)
+    price = serializers.IntegerField(min_value=0)
+    stock_quantity = serializers.IntegerField(min_value=0, default=0)
+    is_active = serializers.BooleanField(default=True)
+    images = ImportImageSerializer(many=True, required=False)
+    attributes = serializers.DictField(child=serializers.CharField(), required=False)
+
+    def validate(self, data):
+        if "id" not in data and "sku" not in data:
+            raise serializers.ValidationError("Either id or sku is required.")
+        if sum(image["is_primary"] for image in data.get("images", [])) > 1:
+            raise serializers.ValidationError(
+                {"images": "At most one image can be primary."}
+            )
+        if any(len(name) > 100 for name in data.get("attributes", {})):
+            raise serializers.ValidationError(
+                {"attributes": "Attribute names are limited to 100 characters."}
+            )
+        return data
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    product = serializers.UUIDField()
+    delta = serializers.IntegerField(default=0)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if "quantity" not in data and not data["delta"]:
+            raise serializers.ValidationError("Give a non-zero delta or a quantity.")
+        return data
+
+
+class StockResultSerializer(serializers.Serializer):
+    product = serializers.UUIDField(source="product_id")
+    ok = serializers.BooleanField()
+    stock_quantity = serializers.IntegerField(allow_null=True)
+    error = serializers.CharField()
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(required=False, help_text="Cursor or ISO timestamp.")
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=200
+    )
@@ -0,0 +1,461 @@
+import uuid
+from dataclasses import dataclass
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections, router, transaction
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    Max,
+    Min,
+    Prefetch,
+    Q,
+    QuerySet,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Cast, Coalesce, RowNumber
+from django.utils import timezone
+
+from apps.catalog.models import (
+    Category,
+    Product,
+    ProductImage,
+    ProductAttribute,
+    Review,
+)
+from apps.common.cache import bump_model_version
+
+STARS = range(1, 6)
+RATING_FIELDS = ["rating_count", "rating_avg", *(f"rating_{s}" for s in STARS)]
+
+# rows per UPDATE ... FROM (VALUES ...) statement (3 parameters each)
+STOCK_BATCH_SIZE = 1000
+# per request to the stock endpoint
+STOCK_MAX_ADJUSTMENTS = 10000
+
+# ?ordering= name -> ProductPopularity window (7d is "best-selling")
+POPULARITY_ORDERINGS = {
+    "popularity": "sold_7d",
+    "popularity_24h": "sold_24h",
+    "popularity_30d": "sold_30d",
+}
+
+# a product card shows its primary image, else the first by sort_rank
+CARD_IMAGE_ORDERING = ("-is_primary", "sort_rank", "id")
+
+# below this length trigrams say little; plain prefix match instead
+SUGGEST_MIN_TRIGRAM_LENGTH = 3
+
+
+def card_image_prefetch() -> Prefetch:
+    # one image per product (primary first, then lowest sort_rank), fetched
+    # for the whole page in a single windowed query
+    return Prefetch(
+        "images",
+        queryset=ProductImage.objects.only(
+            "id", "product_id", "url", "alt", "sort_rank", "is_primary"
+        ).order_by(*CARD_IMAGE_ORDERING)[:1],
+        to_attr="card_images",
+    )
+
+
+def card_images(product_ids) -> QuerySet:
+    """card_image_prefetch() as a plain queryset: each product's card image."""
+    return (
+        ProductImage.objects.filter(product_id__in=product_ids)
+        .annotate(
+            card_rank=Window(
+                RowNumber(),
+                partition_by=F("product_id"),
+                order_by=CARD_IMAGE_ORDERING,
+            )
+        )
+        .filter(card_rank=1)
+    )
+
+
+def detail_prefetches() -> list[Prefetch]:
+    return [
+        Prefetch("images", queryset=ProductImage.objects.order_by("sort_rank", "id")),
+        Prefetch(
+            "attributes",
+            queryset=ProductAttribute.objects.select_related("attribute"),
+        ),
+    ]
+
+
+def product_card_queryset(queryset: QuerySet | None = None) -> QuerySet:
+    """
+    Lean list mode: category via JOIN, primary image via one prefetch,
+    large text columns left out. 2 queries per page regardless of size.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    return (
+        queryset.select_related("category")
+        .defer("description", "search_vector")
+        .prefetch_related(card_image_prefetch())
+    )
+
+
+def product_detail_queryset(queryset: QuerySet | None = None) -> QuerySet:
+    """Full representation: one query per relation, never one per row."""
+    if queryset is None:
+        queryset = Product.objects.all()
+    return (
+        queryset.select_related("category")
+        .defer("search_vector")
+        .prefetch_related(*detail_prefetches())
+    )
+
+
+def products_by_ids(ids) -> tuple[list[Product], list]:
+    """
+    Full products for `ids` in the order given (repeats dropped), and the
+    ids that matched nothing. One query per relation, whatever the count.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = product_detail_queryset().in_bulk(ids)
+    missing = [pk for pk in ids if pk not in found]
+    return [found[pk] for pk in ids if pk in found], missing
+
+
+def annotate_popularity(queryset: QuerySet, names) -> QuerySet:
+    # LEFT JOIN on the one-row-per-product table; no row means nothing sold
+    return queryset.annotate(
+        **{
+            name: Coalesce(
+                F(f"popularity_counts__{POPULARITY_ORDERINGS[name]}"),
+                Value(0),
+                output_field=IntegerField(),
+            )
+            for name in names
+        }
+    )
+
+
+def related_products(product_id, kind: str) -> QuerySet:
+    """Precomputed recommendations, best first: one range of uq_related_product_rank."""
+    return product_card_queryset(
+        Product.objects.filter(
+            related_to__product_id=product_id, related_to__kind=kind, is_active=True
+        ).order_by("related_to__rank")
+    )
+
+
+def category_tree() -> list[dict]:
+    """The whole category tree, nested, from one query; children by name."""
+    nodes, roots = {}, []
+    # by depth: a parent is always placed before its children
+    for pk, name, parent_id in Category.objects.order_by("depth", "name").values_list(
+        "pk", "name", "parent_id"
+    ):
+        node = nodes[pk] = {"id": pk, "name": name, "children": []}
+        (nodes[parent_id]["children"] if parent_id else roots).append(node)
+    return roots
+
+
+def _suggest(queryset: QuerySet, field: str, prefix: str, limit: int) -> QuerySet:
+    """
+    Top `limit` {"id", field} rows of `queryset` completing `prefix`.
+    PostgreSQL: typo-tolerant word similarity served by the pg_trgm GIN
+    index (migration 0003); elsewhere: case-insensitive prefix match.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor != "postgresql" or len(prefix) < SUGGEST_MIN_TRIGRAM_LENGTH:
+        queryset = queryset.filter(**{f"{field}__istartswith": prefix}).order_by(field)
+    else:
+        queryset = (
+            queryset.filter(**{f"{field}__trigram_word_similar": prefix})
+            .annotate(score=TrigramWordSimilarity(prefix, field))
+            .order_by("-score", field)
+        )
+    return queryset.values("id", field)[:limit]
+
+
+def suggest_products(prefix: str, limit: int) -> QuerySet:
+    return _suggest(Product.objects.filter(is_active=True), "title", prefix, limit)
+
+
+def suggest_categories(prefix: str, limit: int) -> QuerySet:
+    return _suggest(Category.objects.all(), "name", prefix, limit)
+
+
+def product_facets(queryset: QuerySet, price_buckets: int = 10) -> dict:
+    """
+    Facet counts for an already-filtered product queryset in three grouped
+    queries: category x availability (+ price bounds), attribute values,
+    price histogram.
+    """
+    queryset = queryset.order_by()
+
+    by_category = list(
+        queryset.values("category_id", "category__name")
+        .annotate(
+            count=Count("pk"),
+            in_stock=Count("pk", filter=Q(stock_quantity__gt=0)),
+            price_min=Min("price"),
+            price_max=Max("price"),
+        )
+        .order_by("category__name")
+    )
+    total = sum(row["count"] for row in by_category)
+    in_stock = sum(row["in_stock"] for row in by_category)
+
+    attributes = {}
+    attribute_rows = (
+        ProductAttribute.objects.filter(product__in=queryset.values("pk"))
+        .values("attribute__name", "value_text")
+        .annotate(count=Count("product_id"))
+        .order_by("attribute__name", "-count", "value_text")
+    )
+    for row in attribute_rows:
+        attributes.setdefault(row["attribute__name"], []).append(
+            {"value": row["value_text"], "count": row["count"]}
+        )
+
+    return {
+        "count": total,
+        "categories": [
+            {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "count": row["count"],
+            }
+            for row in by_category
+        ],
+        "attributes": [
+            {"name": name, "values": values} for name, values in attributes.items()
+        ],
+        "availability": {"in_stock": in_stock, "out_of_stock": total - in_stock},
+        "price": _price_histogram(queryset, by_category, price_buckets),
+    }
+
+
+def _price_histogram(queryset: QuerySet, by_category: list, buckets: int) -> dict:
+    if not by_category:
+        return {"min": None, "max": None, "buckets": []}
+    low = min(row["price_min"] for row in by_category)
+    high = max(row["price_max"] for row in by_category)
+    # integer-width buckets covering [low, high]
+    width = max(1, -(-(high - low + 1) // buckets))
+
+    counts = dict(
+        queryset.annotate(
+            bucket=ExpressionWrapper(
+                (F("price") - low) / width, output_field=IntegerField()
+            )
+        )
+        .values("bucket")
+        .annotate(count=Count("pk"))
+        .values_list("bucket", "count")
+    )
+    return {
+        "min": low,
+        "max": high,
+        "buckets": [
+            {
+                "min": low + i * width,
+                "max": min(high, low + (i + 1) * width - 1),
+                "count": counts.get(i, 0),
+            }
+            for i in range(-(-(high - low + 1) // width))
+        ],
+    }
+
+
+def touch_products(*product_ids) -> None:
+    """Bump updated_at so the change feed sees edits to a product's children."""
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+
+def apply_review_delta(
+    product_id, added: int | None = None, removed: int | None = None
+) -> None:
+    """
+    Move one review into (`added`) and/or out of (`removed`) a product's
+    rating aggregates with a single relative UPDATE; no read, no race.
+    """
+    deltas = {star: 0 for star in STARS}
+    if added:
+        deltas[added] += 1
+    if removed:
+        deltas[removed] -= 1
+    if not any(deltas.values()):
+        return
+
+    count_delta = sum(deltas.values())
+    histogram = {star: F(f"rating_{star}") + d for star, d in deltas.items()}
+    count = F("rating_count") + count_delta
+    total = sum(star * histogram[star] for star in STARS)
+
+    Product.objects.filter(pk=product_id).update(
+        updated_at=timezone.now(),
+        rating_count=count,
+        rating_avg=Case(
+            When(
+                rating_count__gt=-count_delta,
+                then=Cast(total, FloatField()) / Cast(count, FloatField()),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        **{f"rating_{star}": histogram[star] for star, d in deltas.items() if d},
+    )
+
+
+def rebuild_review_aggregates(batch_size: int = 1000) -> int:
+    """
+    Recompute every product's rating aggregates from Review: per batch of
+    products one grouped aggregate + one bulk_update. Returns products seen.
+    """
+    seen = 0
+    last_pk = None
+    while True:
+        products = Product.objects.order_by("pk").only("pk", *RATING_FIELDS)
+        if last_pk is not None:
+            products = products.filter(pk__gt=last_pk)
+        batch = list(products[:batch_size])
+        if not batch:
+            return seen
+
+        stats = {
+            row["product_id"]: row
+            for row in Review.objects.filter(product__in=[p.pk for p in batch])
+            .order_by()
+            .values("product_id")
+            .annotate(
+                rating_count=Count("pk"),
+                **{
+                    f"rating_{star}": Count("pk", filter=Q(rating=star))
+                    for star in STARS
+                },
+            )
+        }
+        for product in batch:
+            row = stats.get(product.pk, {})
+            for star in STARS:
+                setattr(product, f"rating_{star}", row.get(f"rating_{star}", 0))
+            product.rating_count = row.get("rating_count", 0)
+            total = sum(star * getattr(product, f"rating_{star}") for star in STARS)
+            product.rating_avg = (
+                total / product.rating_count if product.rating_count else 0.0
+            )
+        Product.objects.bulk_update(batch, RATING_FIELDS)
+
+        seen += len(batch)
+        last_pk = batch[-1].pk
+
+
+@dataclass
+class StockAdjustment:
+    product_id: uuid.UUID
+    delta: int = 0
+    quantity: int | None = None  # absolute level, applied before delta
+
+
+@dataclass
+class StockResult:
+    product_id: uuid.UUID
+    ok: bool
+    stock_quantity: int | None = None  # new level, or current one if rejected
+    error: str = ""
+
+
+def _stock_rounds(adjustments) -> list[list[tuple[int, StockAdjustment]]]:
+    # an UPDATE ... FROM applies one VALUES row per product, so the k-th row
+    # for each product goes in round k: [(input index, adjustment), ...]
+    rounds, seen = [], {}
+    for index, adj in enumerate(adjustments):
+        k = seen.get(adj.product_id, 0)
+        seen[adj.product_id] = k + 1
+        if k == len(rounds):
+            rounds.append([])
+        rounds[k].append((index, adj))
+    return rounds
+
+
+def adjust_stock(adjustments) -> list[StockResult]:
+    """
+    Apply stock deltas / absolute levels in one UPDATE ... FROM (VALUES ...)
+    ... RETURNING per STOCK_BATCH_SIZE rows. A row that would take its
+    product negative is left unapplied and reported, as are unknown ids.
+
+    Results come back one per row, in input order. Rows for the same
+    product apply in order, each accepted or rejected on its own (the
+    k-th row of every product goes in the k-th UPDATE round).
+    """
+    adjustments = list(adjustments)
+    if not adjustments:
+        return []
+
+    connection = connections[router.db_for_write(Product)]
+    table = connection.ops.quote_name(Product._meta.db_table)
+    pk_field = Product._meta.pk
+    level = "COALESCE(v.column2, stock_quantity) + v.column3"
+    # first VALUES row carries the column types; an all-NULL column would
+    # otherwise come out as text
+    first_row = (
+        "(CAST(%s AS uuid), CAST(%s AS integer), CAST(%s AS integer))"
+        if connection.vendor == "postgresql"
+        else "(%s, CAST(%s AS integer), CAST(%s AS integer))"
+    )
+    updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    results = [None] * len(adjustments)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for rows in _stock_rounds(adjustments):
+            applied = {}
+            for start in range(0, len(rows), STOCK_BATCH_SIZE):
+                batch = rows[start : start + STOCK_BATCH_SIZE]
+                values = ", ".join([first_row] + ["(%s, %s, %s)"] * (len(batch) - 1))
+                params = [updated_at]
+                for _, adj in batch:
+                    params += [pk_field.get_db_prep_value(adj.product_id, connection)]
+                    params += [adj.quantity, adj.delta]
+                cursor.execute(
+                    f"UPDATE {table} SET stock_quantity = {level}, updated_at = %s "
+                    f"FROM (VALUES {values}) AS v "
+                    f"WHERE {table}.id = v.column1 AND {level} >= 0 "
+                    f"RETURNING {table}.id, {table}.stock_quantity",
+                    params,
+                )
+                for raw_id, quantity in cursor.fetchall():
+                    applied[pk_field.to_python(raw_id)] = quantity
+
+            # levels as of this round, for the rows it rejected
+            rejected = {adj.product_id for _, adj in rows} - applied.keys()
+            current = dict(
+                Product.objects.using(connection.alias)
+                .filter(pk__in=rejected)
+                .values_list("pk", "stock_quantity")
+                if rejected
+                else []
+            )
+            for index, adj in rows:
+                if adj.product_id in applied:
+                    results[index] = StockResult(
+                        adj.product_id, True, applied[adj.product_id]
+                    )
+                elif adj.product_id in current:
+                    results[index] = StockResult(
+                        adj.product_id,
+                        False,
+                        current[adj.product_id],
+                        "Insufficient stock.",
+                    )
+                else:
+                    results[index] = StockResult(
+                        adj.product_id, False, error="Product not found."
+                    )
+
+    if any(result.ok for result in results):
+        # queryset-level writes send no signals
+        bump_model_version(Product)
+    return results
@@ -0,0 +1,91 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.catalog.models import (
+    Attribute,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+    ProductTombstone,
+    Review,
+)
+from apps.catalog.services import apply_review_delta, touch_products
+from apps.common.cache import bump_model_version
+
+CACHED_MODELS = (Product, ProductImage, ProductAttribute, Attribute, Category, Review)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, update_fields=None, **kwargs):
+    # what the row looked like before this save, so post_save can move it
+    instance._rating_before = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {"rating", "product"} & set(update_fields):
+        return
+    instance._rating_before = (
+        Review.objects.filter(pk=instance.pk)
+        .values_list("product_id", "rating")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        apply_review_delta(instance.product_id, added=instance.rating)
+        return
+    before = getattr(instance, "_rating_before", None)
+    if before is None or before == (instance.product_id, instance.rating):
+        touch_products(instance.product_id)
+        return
+    old_product_id, old_rating = before
+    if old_product_id == instance.product_id:
+        apply_review_delta(
+            instance.product_id, added=instance.rating, removed=old_rating
+        )
+    else:
+        apply_review_delta(old_product_id, removed=old_rating)
+        apply_review_delta(instance.product_id, added=instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_product(origin):
+        return
+    apply_review_delta(instance.product_id, removed=instance.rating)
+
+
+def _deleting_product(origin) -> bool:
+    # cascade from a Product delete: nothing left to update on the parent
+    return origin is not None and getattr(origin, "model", type(origin)) is Product
+
+
+# (apply_review_delta already bumps updated_at for reviews)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=ProductAttribute)
+def touch_parent_product(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleting_product(origin):
+        return
+    touch_products(instance.product_id)
+
+
+@receiver(post_delete, sender=Product)
+def record_product_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    bump_model_version(sender)
+
+
+# connected per model: a sender-less receiver would disable Django's fast
+# (signal-free) deletes for every model in the project
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
@@ -1 +1,372 @@
-# Create your tests here.
+import io
+import json
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.catalog import changes
+from apps.catalog.models import (
+    Attribute,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductCooccurrence,
+    ProductPopularity,
+    ProductTombstone,
+    RelatedProduct,
+)
+from apps.catalog.popularity import CHECKPOINT, refresh_popularity
+from apps.catalog.related import (
+    BOUGHT_TOGETHER_CHECKPOINT,
+    refresh_bought_together,
+    refresh_similar,
+)
+from apps.catalog.services import StockAdjustment, adjust_stock
+from apps.common.models import JobCheckpoint
+from apps.orders.models import Order, OrderItem
+from apps.orders.services import cancel_order
+
+
+def place_order(user, products, quantity=1, status=Order.Status.PAID, at=None):
+    """An order for `products`, created (and last saved) at `at`."""
+    order = Order.objects.create(user=user, status=status)
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product=product,
+            product_title=product.title,
+            unit_price=product.price,
+            quantity=quantity,
+        )
+        for product in products
+    )
+    at = at or timezone.now() - timedelta(hours=1)
+    Order.objects.filter(pk=order.pk).update(created_at=at, updated_at=at)
+    OrderItem.objects.filter(order=order).update(created_at=at)
+    return order
+
+
+def cancel_since_checkpoint(order, checkpoint):
+    """Cancel `order` between the `checkpoint` job's last run and now."""
+    ten_minutes_ago = timezone.now() - timedelta(minutes=10)
+    JobCheckpoint.objects.filter(name=checkpoint).update(
+        position=ten_minutes_ago - timedelta(minutes=10)
+    )
+    cancel_order(order)
+    Order.objects.filter(pk=order.pk).update(updated_at=ten_minutes_ago)
+
+
+class AdjustStockTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Stock")
+        self.a = Product.objects.create(
+            title="A", category=category, price=100, stock_quantity=5
+        )
+        self.b = Product.objects.create(
+            title="B", category=category, price=100, stock_quantity=1
+        )
+
+    def test_one_result_per_row_in_input_order(self):
+        missing = uuid.uuid4()
+        results = adjust_stock(
+            [
+                StockAdjustment(self.a.pk, delta=-3),
+                StockAdjustment(self.b.pk, delta=-2),
+                StockAdjustment(self.a.pk, delta=-3),
+                StockAdjustment(missing, delta=1),
+                StockAdjustment(self.a.pk, quantity=10),
+                StockAdjustment(self.a.pk, delta=-4),
+                StockAdjustment(self.b.pk, delta=-1),
+            ]
+        )
+        self.assertEqual(
+            [(r.product_id, r.ok, r.stock_quantity, r.error) for r in results],
+            [
+                (self.a.pk, True, 2, ""),
+                (self.b.pk, False, 1, "Insufficient stock."),
+                (self.a.pk, False, 2, "Insufficient stock."),
+                (missing, False, None, "Product not found."),
+                (self.a.pk, True, 10, ""),
+                (self.a.pk, True, 6, ""),
+                (self.b.pk, True, 0, ""),
+            ],
+        )
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.stock_quantity, self.b.stock_quantity), (6, 0))
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Popular")
+        self.product = Product.objects.create(
+            title="P", category=category, price=100, stock_quantity=10
+        )
+        self.user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+
+    def order(self, quantity, status=Order.Status.PAID):
+        return place_order(self.user, [self.product], quantity, status)
+
+    def sold(self):
+        row = ProductPopularity.objects.filter(product=self.product).first()
+        return row and (row.sold_24h, row.sold_7d, row.sold_30d)
+
+    def test_cancelled_orders_do_not_count(self):
+        self.order(3)
+        self.order(4, status=Order.Status.CANCELLED)
+        refresh_popularity()
+        self.assertEqual(self.sold(), (3, 3, 3))
+
+    def test_later_cancellation_is_taken_back(self):
+        first = self.order(3)
+        self.order(2)
+        refresh_popularity()
+        self.assertEqual(self.sold(), (5, 5, 5))
+
+        cancel_since_checkpoint(first, CHECKPOINT)
+        stats = refresh_popularity()
+        self.assertEqual(stats["recounted"], 1)
+        self.assertEqual(self.sold(), (2, 2, 2))
+
+        # seeing the cancelled order again doesn't take it back twice
+        JobCheckpoint.objects.filter(name=CHECKPOINT).update(
+            position=timezone.now() - timedelta(minutes=20)
+        )
+        refresh_popularity()
+        self.assertEqual(self.sold(), (2, 2, 2))
+
+
+class BoughtTogetherTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Baskets")
+        self.a, self.b, self.c = (
+            Product.objects.create(title=title, category=category, price=100)
+            for title in "ABC"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+
+    def pairs(self):
+        return {
+            (pair.product.title, pair.other.title): pair.orders
+            for pair in ProductCooccurrence.objects.select_related("product", "other")
+            if pair.product.title < pair.other.title
+        }
+
+    def related(self, product):
+        return list(
+            RelatedProduct.objects.filter(
+                product=product, kind=RelatedProduct.Kind.BOUGHT_TOGETHER
+            )
+            .order_by("rank")
+            .values_list("related__title", flat=True)
+        )
+
+    def test_cancelled_orders_do_not_count(self):
+        place_order(self.user, [self.a, self.b])
+        place_order(self.user, [self.b, self.c], status=Order.Status.CANCELLED)
+        refresh_bought_together()
+        self.assertEqual(self.pairs(), {("A", "B"): 1})
+
+    def test_later_cancellation_is_taken_back(self):
+        place_order(self.user, [self.a, self.b])
+        both = place_order(self.user, [self.a, self.b, self.c])
+        refresh_bought_together()
+        self.assertEqual(self.pairs(), {("A", "B"): 2, ("A", "C"): 1, ("B", "C"): 1})
+        self.assertCountEqual(self.related(self.c), ["A", "B"])
+
+        cancel_since_checkpoint(both, BOUGHT_TOGETHER_CHECKPOINT)
+        stats = refresh_bought_together()
+        self.assertEqual(stats["recounted"], 3)
+        self.assertEqual(self.pairs(), {("A", "B"): 1})
+        self.assertEqual(self.related(self.a), ["B"])
+        self.assertEqual(self.related(self.c), [])
+
+        # seeing the cancelled order again doesn't take it back twice
+        JobCheckpoint.objects.filter(name=BOUGHT_TOGETHER_CHECKPOINT).update(
+            position=timezone.now() - timedelta(minutes=20)
+        )
+        refresh_bought_together()
+        self.assertEqual(self.pairs(), {("A", "B"): 1})
+
+
+class SimilarProductsTests(TestCase):
+    def setUp(self):
+        shoes, hats = (Category.objects.create(name=name) for name in ("Shoes", "Hats"))
+        colour = Attribute.objects.create(name="Colour")
+        self.products = {}
+        for title, category, price, value in [
+            ("red shoe", shoes, 100, "Red"),
+            ("red boot", shoes, 100, "red "),
+            ("blue shoe", shoes, 110, "Blue"),
+            ("luxury shoe", shoes, 9000, "Red"),
+            ("red hat", hats, 100, "Red"),
+        ]:
+            product = Product.objects.create(
+                title=title, category=category, price=price
+            )
+            ProductAttribute.objects.create(
+                product=product, attribute=colour, value_text=value
+            )
+            self.products[title] = product
+
+    def similar(self, title):
+        return list(
+            RelatedProduct.objects.filter(
+                product=self.products[title], kind=RelatedProduct.Kind.SIMILAR
+            )
+            .order_by("rank")
+            .values_list("related__title", flat=True)
+        )
+
+    def test_neighbours_come_from_the_same_category(self):
+        stats = refresh_similar(k=2)
+        self.assertEqual(stats["groups"], 2)
+        # same colour and price band first; never the hat
+        similar = self.similar("red shoe")
+        self.assertEqual(similar[0], "red boot")
+        self.assertEqual(len(similar), 2)
+        self.assertNotIn("red hat", similar)
+        self.assertEqual(self.similar("red hat"), [])
+
+    def test_large_categories_are_split_by_price_band(self):
+        stats = refresh_similar(k=2, group_size=3)
+        self.assertGreater(stats["groups"], 2)
+        self.assertNotIn("luxury shoe", self.similar("red shoe"))
+        self.assertEqual(self.similar("luxury shoe"), [])
+
+
+class DummyCatalogClearTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Old")
+        self.old = Product.objects.create(title="Old", category=category, price=100)
+        self.user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+        for name in (CHECKPOINT, BOUGHT_TOGETHER_CHECKPOINT):
+            JobCheckpoint.objects.create(name=name, position=timezone.now())
+
+    def clear(self, *args):
+        call_command(
+            "dummy_catalog", "--clear", "--products=3", *args, stdout=io.StringIO()
+        )
+
+    def test_refuses_while_orders_have_lines(self):
+        order = place_order(self.user, [self.old])
+        with self.assertRaisesMessage(CommandError, "--delete-orders"):
+            self.clear()
+        self.assertTrue(OrderItem.objects.filter(order=order).exists())
+        self.assertTrue(Product.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(ProductTombstone.objects.exists())
+
+    def test_delete_orders_removes_whole_orders(self):
+        place_order(self.user, [self.old])
+        self.clear("--delete-orders")
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Product.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_clearing_leaves_tombstones_and_resets_checkpoints(self):
+        self.clear()
+        self.assertEqual(
+            list(ProductTombstone.objects.values_list("product_id", flat=True)),
+            [self.old.pk],
+        )
+        self.assertFalse(
+            JobCheckpoint.objects.filter(
+                name__in=[CHECKPOINT, BOUGHT_TOGETHER_CHECKPOINT]
+            ).exists()
+        )
+
+
+class ChangeFeedTests(TestCase):
+    url = "/api/catalog/changes/"
+
+    def setUp(self):
+        category = Category.objects.create(name="Feed")
+        self.a, self.b = (
+            Product.objects.create(title=title, category=category, price=100)
+            for title in "AB"
+        )
+        # committed long ago
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def feed(self, since=None):
+        response = self.client.get(self.url, {"since": since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deletions_arrive_as_tombstones_after_the_cursor(self):
+        first = self.feed()
+        self.assertEqual(
+            [(c["op"], c["id"]) for c in first["changes"]],
+            sorted([("upsert", str(self.a.pk)), ("upsert", str(self.b.pk))]),
+        )
+
+        deleted = str(self.a.pk)
+        self.a.delete()
+        # younger than COMMIT_LAG: its transaction may still be open
+        second = self.feed(first["next"])
+        self.assertEqual(second["changes"], [])
+
+        with mock.patch.object(changes, "COMMIT_LAG", timedelta(0)):
+            third = self.feed(second["next"])
+        self.assertEqual(
+            [(c["op"], c["id"]) for c in third["changes"]],
+            [("delete", deleted)],
+        )
+        self.assertEqual(self.feed(third["next"])["changes"], [])
+
+
+@override_settings(CATALOG_CACHE_SECONDS=60)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shoes, hats = (Category.objects.create(name=name) for name in ("Shoes", "Hats"))
+        colour = Attribute.objects.create(name="Colour")
+        cls.products = [
+            Product.objects.create(
+                title=title, category=category, price=price, stock_quantity=2
+            )
+            for title, category, price in [
+                ("Boot", shoes, 12800),
+                ("Sandal", shoes, 4200),
+                ("Cap", hats, 3000),
+            ]
+        ]
+        ProductAttribute.objects.create(
+            product=cls.products[0], attribute=colour, value_text="Black"
+        )
+        cls.hats = hats
+
+    def setUp(self):
+        cache.clear()
+
+    async def assertSamePayload(self, path):
+        sync = await sync_to_async(self.client.get)(f"/api/catalog/{path}")
+        response = await self.async_client.get(f"/api/async/catalog/{path}")
+        self.assertEqual(response.status_code, sync.status_code)
+        # pagination links point back at the view that served them
+        content = response.content.decode().replace("/api/async/", "/api/")
+        self.assertEqual(json.loads(content), sync.json())
+
+    async def test_list_and_retrieve_match_the_sync_views(self):
+        for path in [
+            "products/",
+            "products/?ordering=-price&page_size=2",
+            f"products/?category={self.hats.pk}",
+            f"products/{self.products[0].pk}/",
+            f"products/{uuid.uuid4()}/",
+        ]:
+            with self.subTest(path=path):
+                await self.assertSamePayload(path)
@@ -6,6 +6,7 @@ from apps.catalog.views import (
     AttributeViewSet,
     ProductAttributeViewSet,
     ReviewViewSet,
+    ChangeFeedViewSet,
 )
 
 router = DefaultRouter()
@@ -17,5 +18,6 @@ router.register(
     r"product-attributes", ProductAttributeViewSet, basename="product-attribute"
 )
 router.register(r"reviews", ReviewViewSet, basename="review")
+router.register(r"changes", ChangeFeedViewSet, basename="catalog-change")
 
 urlpatterns = router.urls
@@ -1,5 +1,14 @@
 # apps/catalog/views.py
-from rest_framework import viewsets, permissions, filters as drf_filters
+import io
+import uuid
+
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, permissions, status, filters as drf_filters
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 
 from apps.catalog.models import (
@@ -8,42 +17,99 @@ from apps.catalog.models import (
     ProductImage,
     Attribute,
     ProductAttribute,
+    ProductPopularity,
+    RelatedProduct,
     Review,
 )
 from apps.catalog.serializers import (
     CategorySerializer,
     ProductSerializer,
+    ProductCardSerializer,
+    ProductCardValuesSerializer,
     ProductImageSerializer,
     AttributeSerializer,
     ProductAttributeSerializer,
     ReviewSerializer,
+    SuggestQuerySerializer,
+    FacetQuerySerializer,
+    StockAdjustmentSerializer,
+    StockResultSerializer,
+    ChangeFeedQuerySerializer,
+    ProductBatchSerializer,
+)
+from apps.catalog.filters import ProductFilter, ProductSearchFilter
+from apps.catalog.changes import InvalidCursor, product_changes
+from apps.catalog.exporter import CONTENT_TYPES, export_products
+from apps.catalog.importer import ImportFormatError, detect_format, import_products
+from apps.common.cache import CachedResponseMixin, cache_response
+from apps.common.pagination import CachedCountPagination
+from apps.common.values import ValuesListMixin
+from apps.catalog.services import (
+    POPULARITY_ORDERINGS,
+    STOCK_MAX_ADJUSTMENTS,
+    annotate_popularity,
+    category_tree,
+    StockAdjustment,
+    adjust_stock,
+    product_detail_queryset,
+    product_facets,
+    products_by_ids,
+    related_products,
+    suggest_categories,
+    suggest_products,
 )
-from apps.catalog.filters import ProductFilter
 
 
 class DefaultPerm(permissions.IsAuthenticatedOrReadOnly):
     pass
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+# everything a product listing is built from
+PRODUCT_CACHE_MODELS = (
+    Product,
+    ProductPopularity,
+    RelatedProduct,
+    ProductImage,
+    ProductAttribute,
+    Attribute,
+    Category,
+    Review,
+)
+
+
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (Category,)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [DefaultPerm]
     filter_backends = [drf_filters.SearchFilter, drf_filters.OrderingFilter]
     search_fields = ["name"]
-    ordering_fields = ["name" "created_at"]
+    ordering_fields = ["name", "depth", "created_at"]
     ordering = ["name"]
 
+    # GET /categories/tree/ -> every category, nested
+    @action(detail=False, methods=["get"], filter_backends=[], pagination_class=None)
+    @cache_response
+    def tree(self, request):
+        return Response(category_tree())
+
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedResponseMixin, ValuesListMixin, viewsets.ModelViewSet):
+    cache_models = PRODUCT_CACHE_MODELS
     queryset = Product.objects.select_related("category")
     serializer_class = ProductSerializer
+    # list payload (and its schema); rows built by list_values_class
+    list_serializer_class = ProductCardSerializer
+    list_values_class = ProductCardValuesSerializer
     permission_classes = [DefaultPerm]
+    pagination_class = CachedCountPagination
 
     filter_backends = [
         DjangoFilterBackend,
         drf_filters.SearchFilter,
         drf_filters.OrderingFilter,
+        # after OrderingFilter: ranks results when no ?ordering= is given
+        ProductSearchFilter,
     ]
 
     filterset_class = ProductFilter
@@ -55,11 +121,187 @@ class ProductViewSet(viewsets.ModelViewSet):
         "price",
         "is_active",
         "stock_quantity",
+        "rating_avg",
+        "rating_count",
+        *POPULARITY_ORDERINGS,
     ]
     ordering = ["-created_at"]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # popularity lives in its own table; join it only when sorting by it
+        ordering = self.request.query_params.get(api_settings.ORDERING_PARAM, "")
+        requested = {term.strip().lstrip("-") for term in ordering.split(",")}
+        if requested & POPULARITY_ORDERINGS.keys():
+            queryset = annotate_popularity(
+                queryset, requested & POPULARITY_ORDERINGS.keys()
+            )
+
+        # fixed query count per page: list -> card rows, everything else -> full
+        if self.action in ("list", "facets"):
+            return queryset
+        return product_detail_queryset(queryset)
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    # GET /products/suggest/?q=sne&limit=8 -> title + category completions
+    @action(detail=False, methods=["get"], filter_backends=[], pagination_class=None)
+    @cache_response
+    def suggest(self, request):
+        params = SuggestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        prefix, limit = params.validated_data["q"], params.validated_data["limit"]
+        return Response(
+            {
+                "products": list(suggest_products(prefix, limit)),
+                "categories": list(suggest_categories(prefix, limit)),
+            }
+        )
 
-class ProductImageViewSet(viewsets.ModelViewSet):
+    # GET /products/facets/?<same filters as list> -> counts for the result set
+    @action(detail=False, methods=["get"], pagination_class=None)
+    @cache_response
+    def facets(self, request):
+        params = FacetQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(
+            product_facets(queryset, params.validated_data["price_buckets"])
+        )
+
+    # GET /products/batch/?ids=<id>,<id>,... or POST {"ids": [...]} for lists
+    # too long for a URL -> full products in request order, plus `missing`
+    @action(
+        detail=False,
+        methods=["get", "post"],
+        permission_classes=[permissions.AllowAny],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    @cache_response
+    def batch(self, request):
+        if request.method == "POST":
+            data = request.data
+        else:
+            raw = request.query_params.get("ids", "")
+            data = {"ids": [pk.strip() for pk in raw.split(",") if pk.strip()]}
+        params = ProductBatchSerializer(data=data)
+        params.is_valid(raise_exception=True)
+        products, missing = products_by_ids(params.validated_data["ids"])
+        return Response(
+            {
+                "results": ProductSerializer(
+                    products, many=True, context=self.get_serializer_context()
+                ).data,
+                "missing": missing,
+            }
+        )
+
+    # GET /products/{id}/related/ -> frequently bought together, best first
+    @action(detail=True, methods=["get"], filter_backends=[], pagination_class=None)
+    @cache_response
+    def related(self, request, pk=None):
+        return self.related_response(pk, RelatedProduct.Kind.BOUGHT_TOGETHER)
+
+    # GET /products/{id}/similar/ -> nearest by category, price band, attributes
+    @action(detail=True, methods=["get"], filter_backends=[], pagination_class=None)
+    @cache_response
+    def similar(self, request, pk=None):
+        return self.related_response(pk, RelatedProduct.Kind.SIMILAR)
+
+    def related_response(self, pk, kind):
+        try:
+            product_id = uuid.UUID(str(pk))
+        except ValueError:
+            raise Http404
+        cards = ProductCardValuesSerializer()
+        products = cards.serialize(cards.values(related_products(product_id, kind)))
+        # an empty list is also what an unknown product would give
+        if not products and not Product.objects.filter(pk=product_id).exists():
+            raise Http404
+        return Response({"kind": kind, "results": products})
+
+    # POST /products/stock/ [{"product": <id>, "delta": -2 | "quantity": 9}, ...]
+    # -> one result per row, in request order
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[permissions.IsAdminUser],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def stock(self, request):
+        serializer = StockAdjustmentSerializer(
+            data=request.data, many=True, max_length=STOCK_MAX_ADJUSTMENTS
+        )
+        serializer.is_valid(raise_exception=True)
+        results = adjust_stock(
+            StockAdjustment(
+                row["product"], delta=row["delta"], quantity=row.get("quantity")
+            )
+            for row in serializer.validated_data
+        )
+        return Response(
+            {
+                "updated": sum(result.ok for result in results),
+                "failed": sum(not result.ok for result in results),
+                "results": StockResultSerializer(results, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    # GET /products/export/?as=ndjson|csv -> every active product, streamed
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAdminUser],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def export(self, request):
+        try:
+            fmt = detect_format("", request.query_params.get("as", "ndjson"))
+        except ImportFormatError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            export_products(fmt), content_type=CONTENT_TYPES[fmt]
+        )
+        filename = f"catalog-{timezone.now():%Y%m%d}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    # POST /products/import/ (multipart: file=<feed.csv|.ndjson>[, as=csv|ndjson])
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[permissions.IsAdminUser],
+        parser_classes=[MultiPartParser],
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def import_feed(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload the feed as `file`."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            fmt = detect_format(upload.name, request.data.get("as"))
+            # read straight off the (spooled) upload, never all of it at once
+            stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            report = import_products(stream, fmt)
+        except (ImportFormatError, UnicodeDecodeError) as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class ProductImageViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (ProductImage, Product)
     queryset = ProductImage.objects.select_related("product").all()
     serializer_class = ProductImageSerializer
     permission_classes = [DefaultPerm]
@@ -68,7 +310,8 @@ class ProductImageViewSet(viewsets.ModelViewSet):
     ordering = ["sort_rank", "id"]
 
 
-class AttributeViewSet(viewsets.ModelViewSet):
+class AttributeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (Attribute,)
     queryset = Attribute.objects.all()
     serializer_class = AttributeSerializer
     permission_classes = [DefaultPerm]
@@ -78,7 +321,8 @@ class AttributeViewSet(viewsets.ModelViewSet):
     ordering = ["name"]
 
 
-class ProductAttributeViewSet(viewsets.ModelViewSet):
+class ProductAttributeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (ProductAttribute, Attribute, Product)
     queryset = ProductAttribute.objects.select_related("product", "attribute").all()
     serializer_class = ProductAttributeSerializer
     permission_classes = [DefaultPerm]
@@ -93,10 +337,12 @@ class ProductAttributeViewSet(viewsets.ModelViewSet):
     ordering = ["sort_rank", "id"]
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (Review, Product)
     queryset = Review.objects.select_related("product", "author").all()
     serializer_class = ReviewSerializer
     permission_classes = [DefaultPerm]
+    pagination_class = CachedCountPagination
     filter_backends = [
         DjangoFilterBackend,
         drf_filters.SearchFilter,
@@ -106,3 +352,46 @@ class ReviewViewSet(viewsets.ModelViewSet):
     search_fields = ["title", "body", "author_name", "product__title", "product__slug"]
     ordering_fields = ["created_at", "rating"]
     ordering = ["-created_at"]
+
+
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """
+    GET /changes/?since=<cursor|ISO timestamp>&limit=100
+    Products changed (full representation) and deleted (tombstones) since
+    the cursor, oldest first; poll again with `next`.
+    """
+
+    permission_classes = [DefaultPerm]
+
+    def list(self, request):
+        params = ChangeFeedQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        try:
+            feed = product_changes(
+                params.validated_data.get("since"), params.validated_data["limit"]
+            )
+        except InvalidCursor as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upserted = [pk for op, pk in feed["changes"] if op == "upsert"]
+        products = {
+            product.pk: product
+            for product in product_detail_queryset().filter(pk__in=upserted)
+        }
+        changes = []
+        for op, item in feed["changes"]:
+            if op == "delete":
+                changes.append({"op": op, "id": item.product_id, "at": item.deleted_at})
+            elif item in products:  # gone since; its tombstone follows
+                product = products[item]
+                changes.append(
+                    {
+                        "op": op,
+                        "id": product.pk,
+                        "at": product.updated_at,
+                        "product": ProductSerializer(product).data,
+                    }
+                )
+        return Response(
+            {"changes": changes, "next": feed["next"], "has_more": feed["has_more"]}
+        )
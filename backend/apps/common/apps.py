@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.common"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from config.routers import watch_writes
+
+        # every new primary connection reports writes to the replica router
+        connection_created.connect(watch_writes, dispatch_uid="config.routers")
@@ -0,0 +1,115 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import close_old_connections
+from django.http import Http404
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from apps.common.cache import acache_response
+
+
+class AsyncReadViewMixin:
+    """
+    Async GET/HEAD actions on a DRF viewset, routed with as_async_view().
+
+    DRF dispatches synchronously, so each request would hold a worker
+    thread until its response is written. Here the request runs as a
+    coroutine: queries go through Django's async ORM, the cache through
+    its async API, and the event loop serves other clients meanwhile.
+    Authentication, permissions, throttles and filter validation reuse the
+    viewset's own code and run in a thread, because they may query.
+
+    Payloads, filters, orderings, cursors, ETags and the response cache are
+    the same as the sync actions'. JSON only: the browsable API renders
+    forms with synchronous queries.
+    """
+
+    renderer_classes = [
+        renderer
+        for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    ]
+
+    @classmethod
+    def as_async_view(cls, action: str):
+        async def view(request, *args, **kwargs):
+            self = cls(action_map={"get": action, "head": action})
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.__name__ = f"{cls.__name__}.{action}"
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, self.action or "", None)
+            if handler is None:
+                self.http_method_not_allowed(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except (APIException, Http404, PermissionDenied) as exc:
+            # what handle_exception() turns into responses; anything else
+            # (e.g. SynchronousOnlyOperation) is a bug and propagates
+            response = self.handle_exception(exc)
+
+        # Django only releases connections at request_finished, i.e. after
+        # the body has gone out to a possibly slow client; hand them back to
+        # the pool now
+        await sync_to_async(close_old_connections)()
+
+        # Django renders it (off the event loop)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def afilter_queryset(self):
+        # filter forms may look rows up (e.g. ?category=<id>)
+        return await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).afirst()
+        except (TypeError, ValueError, ValidationError):
+            obj = None
+        if obj is None:
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    @acache_response
+    async def list(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset()
+        # ValuesListMixin viewsets list from .values() rows
+        values_class = getattr(self, "list_values_class", None)
+        values = values_class() if values_class is not None else None
+        if values is not None:
+            queryset = values.values(queryset)
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, request, self)
+            if page is not None:
+                data = await self.aserialize_list(page, values)
+                return self.get_paginated_response(data)
+        rows = [row async for row in queryset]
+        return Response(await self.aserialize_list(rows, values))
+
+    async def aserialize_list(self, rows, values=None):
+        if values is None:
+            return self.get_serializer(rows, many=True).data
+        # fetch_related() queries
+        return await sync_to_async(values.serialize)(rows)
+
+    @acache_response
+    async def retrieve(self, request, *args, **kwargs):
+        obj = await self.aget_object()
+        return Response(self.get_serializer(obj).data)
@@ -0,0 +1,192 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.common.conditional import make_etag, not_modified, set_validators
+
+VERSION_KEY = "model-version:{label}"
+
+
+def _version_key(model) -> str:
+    return VERSION_KEY.format(label=model._meta.label_lower)
+
+
+def _fresh_version() -> int:
+    # a lost/evicted counter restarts somewhere no old cache key ever used
+    return time.time_ns() // 1000
+
+
+def model_versions(models) -> list[int]:
+    """Current version counter of each model, in one cache round trip."""
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_version(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+async def amodel_versions(models) -> list[int]:
+    keys = [_version_key(model) for model in models]
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, _fresh_version(), timeout=None)
+            found[key] = await cache.aget(key)
+    return [found[key] for key in keys]
+
+
+def _incr_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _fresh_version(), timeout=None)
+
+
+def bump_model_version(model) -> None:
+    """
+    O(1) invalidation of everything cached against `model`, once the open
+    transaction commits (straight away outside one). Bumping earlier would
+    let a concurrent read cache the pre-commit rows under the new version.
+    """
+    transaction.on_commit(functools.partial(_incr_version, _version_key(model)))
+
+
+def _etag(request, digest: str) -> str:
+    # same data renders differently per format (json / browsable api)
+    return make_etag(digest, request.accepted_renderer.format)
+
+
+def _cached_response(request, digest: str, data):
+    etag = _etag(request, digest)
+    response = not_modified(request, etag=etag)
+    if response is None:
+        response = set_validators(Response(data), etag)
+        response["X-Cache"] = "HIT"
+    return response
+
+
+def _fresh_response(request, response, digest: str):
+    etag = _etag(request, digest)
+    conditional = not_modified(request, etag=etag)
+    if conditional is not None:
+        return conditional
+    return set_validators(response, etag)
+
+
+def cache_response(view_method):
+    """
+    Conditional GET + response cache for a viewset action.
+
+    - anonymous 200 response data is cached, keyed by path + normalized query
+      string + versions of the view's `cache_models`
+    - every 200 GET/HEAD gets a strong ETag hashed from its data (kept next
+      to the cached data), so the tag always names the exact body, wherever
+      it was read from; a cache hit answers If-None-Match with 304 without
+      running the view, otherwise the view runs and then is compared
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view_method(self, request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        cacheable = self.is_response_cacheable(request)
+        cached = cache.get(key) if cacheable else None
+        if cached is not None:
+            return _cached_response(request, *cached)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        digest = make_etag(response.data)
+        if cacheable:
+            cache.set(key, (digest, response.data), self.get_response_cache_timeout())
+            response["X-Cache"] = "MISS"
+        return _fresh_response(request, response, digest)
+
+    return wrapper
+
+
+def acache_response(view_method):
+    """cache_response() for the async actions of AsyncReadViewMixin."""
+
+    @functools.wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await view_method(self, request, *args, **kwargs)
+
+        key = await self.aget_response_cache_key(request)
+        cacheable = self.is_response_cacheable(request)
+        cached = await cache.aget(key) if cacheable else None
+        if cached is not None:
+            return _cached_response(request, *cached)
+
+        response = await view_method(self, request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        digest = make_etag(response.data)
+        if cacheable:
+            await cache.aset(
+                key, (digest, response.data), self.get_response_cache_timeout()
+            )
+            response["X-Cache"] = "MISS"
+        return _fresh_response(request, response, digest)
+
+    return wrapper
+
+
+class CachedResponseMixin:
+    """
+    Response cache for read-mostly viewsets. Writes never touch cached keys:
+    post_save/post_delete bump the model version, which changes every key
+    built from it (see apps.catalog.signals).
+    """
+
+    cache_models = ()
+    cache_timeout = None  # None -> settings.CATALOG_CACHE_SECONDS
+
+    def is_response_cacheable(self, request) -> bool:
+        return (
+            not request.user.is_authenticated and self.get_response_cache_timeout() > 0
+        )
+
+    def get_response_cache_timeout(self) -> int:
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return settings.CATALOG_CACHE_SECONDS
+
+    def get_response_cache_key(self, request) -> str:
+        return self.build_response_cache_key(request, model_versions(self.cache_models))
+
+    async def aget_response_cache_key(self, request) -> str:
+        return self.build_response_cache_key(
+            request, await amodel_versions(self.cache_models)
+        )
+
+    def build_response_cache_key(self, request, versions) -> str:
+        params = sorted(
+            (name, value)
+            for name in request.query_params
+            for value in request.query_params.getlist(name)
+        )
+        raw = json.dumps([request.path, params, versions], separators=(",", ":"))
+        # entries are (data digest, data)
+        return "resp:tagged:" + hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,35 @@
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    """Strong validator: quoted digest of whatever the representation depends on."""
+    raw = json.dumps(parts, default=str, separators=(",", ":"))
+    return f'"{hashlib.md5(raw.encode("utf-8")).hexdigest()}"'
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    304 (or 412) answer to the request's If-None-Match / If-Modified-Since /
+    If-Match preconditions, or None when the view should render normally.
+    Call it before serializing anything.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -7,3 +7,14 @@ class TimeStampedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class JobCheckpoint(models.Model):
+    """How far an incremental job has got (e.g. last OrderItem.created_at seen)."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    position = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position.isoformat()}"
@@ -0,0 +1,416 @@
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+import uuid
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+)
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from apps.common.cache import amodel_versions, model_versions
+
+# position = ordering key values of the boundary row
+KeysetCursor = namedtuple("KeysetCursor", ["position", "reverse"])
+
+FALSY = {"0", "false", "no", "off"}
+
+
+def _dump(value):
+    # exact, round-trippable text for cursor values (no ms truncation)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Seek pagination on the queryset's ordering plus the primary key as a
+    tie-breaker, e.g. WHERE (created_at, id) < (:c, :id) ORDER BY -created_at, -id.
+
+    - honours whatever OrderingFilter applied (falls back to Meta.ordering)
+    - cursors are opaque base64 and bound to the ordering they were issued for
+    - `count` is optional: ?count=0 (or include_count = False) skips COUNT(*)
+
+    Ordering keys are expected to be non-null.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+    include_count = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start(queryset, request, view):
+            return None
+        self.count = self.get_count(queryset) if self.wants_count(request) else None
+        return self.finish(list(self.page_queryset(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: same page, links and cursors."""
+        if not self.start(queryset, request, view):
+            return None
+        if self.wants_count(request):
+            self.count = await self.aget_count(queryset)
+        else:
+            self.count = None
+        return self.finish([row async for row in self.page_queryset(queryset)])
+
+    def start(self, queryset, request, view=None) -> bool:
+        self.request = request
+        self.view = view
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return False
+
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_ordering_keys(queryset)
+        self.cursor = self.decode_cursor(request)
+        return True
+
+    def page_queryset(self, queryset):
+        """The current page plus one row (to tell whether more follow)."""
+        reverse = self.cursor.reverse if self.cursor else False
+        if self.cursor:
+            queryset = queryset.filter(self.seek_filter(self.cursor.position, reverse))
+        queryset = queryset.order_by(*self.order_by(reverse))
+        return queryset[: self.page_size + 1]
+
+    def finish(self, rows) -> list:
+        reverse = self.cursor.reverse if self.cursor else False
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = rows
+        return self.page
+
+    # ---- ordering ----
+    def get_ordering_keys(self, queryset) -> list[tuple[str, bool]]:
+        """[(lookup, descending), ...] ending with the primary key."""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not all(isinstance(o, str) and o != "?" for o in ordering):
+            raise ImproperlyConfigured(
+                f"{self.__class__.__name__} needs plain field-name ordering, "
+                f"got {ordering!r}"
+            )
+
+        pk_name = queryset.model._meta.pk.name
+        keys = []
+        for o in ordering:
+            name = o.lstrip("-")
+            name = pk_name if name == "pk" else name
+            keys.append((name, o.startswith("-")))
+            if name == pk_name:
+                break
+        else:
+            # tie-breaker follows the leading direction so one index scan serves both
+            keys.append((pk_name, keys[0][1] if keys else False))
+
+        self.fields = {name: self._resolve_field(queryset, name) for name, _ in keys}
+        return keys
+
+    def order_by(self, reverse: bool) -> list[str]:
+        return [f"-{name}" if desc != reverse else name for name, desc in self.keys]
+
+    def seek_filter(self, position, reverse: bool) -> Q:
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND (b > y OR (b = y AND c > z)))
+        def after(name, desc):
+            return f"{name}__lt" if desc != reverse else f"{name}__gt"
+
+        condition = None
+        for (name, desc), value in reversed(list(zip(self.keys, position))):
+            step = Q(**{after(name, desc): value})
+            if condition is not None:
+                step |= Q(**{name: value}) & condition
+            condition = step
+
+        # redundant bound on the leading key lets the planner use a range scan
+        lead, desc = self.keys[0]
+        bound = f"{lead}__lte" if desc != reverse else f"{lead}__gte"
+        return Q(**{bound: position[0]}) & condition
+
+    def _resolve_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        opts = queryset.model._meta
+        field = None
+        try:
+            for part in name.split("__"):
+                field = opts.get_field(part)
+                if field.is_relation:
+                    opts = field.related_model._meta
+        except FieldDoesNotExist as exc:
+            raise ImproperlyConfigured(f"Cannot paginate on {name!r}") from exc
+        if field.is_relation:
+            field = field.target_field
+        return field
+
+    def _value(self, row, name):
+        if isinstance(row, dict):
+            return row[name]
+        value = row
+        for part in name.split("__"):
+            value = getattr(value, part)
+        if hasattr(value, "_meta"):  # FK ordering -> compare on its key
+            value = value.pk
+        return value
+
+    def position_of(self, row) -> list:
+        return [self._value(row, name) for name, _ in self.keys]
+
+    # ---- count ----
+    def wants_count(self, request) -> bool:
+        if not self.include_count:
+            return False
+        raw = request.query_params.get(self.count_query_param, "")
+        return raw.strip().lower() not in FALSY
+
+    def get_count(self, queryset) -> int:
+        return queryset.count()
+
+    async def aget_count(self, queryset) -> int:
+        return await queryset.acount()
+
+    def get_count_fields(self) -> dict:
+        return {"count": self.count}
+
+    # ---- cursors ----
+    def _signature(self) -> str:
+        return ",".join(f"-{n}" if d else n for n, d in self.keys)
+
+    def encode_cursor(self, cursor):
+        payload = {
+            "o": self._signature(),
+            "p": [_dump(v) for v in cursor.position],
+            "r": int(cursor.reverse),
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        token = base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            if payload["o"] != self._signature():
+                raise ValueError("cursor issued for a different ordering")
+            values = payload["p"]
+            if len(values) != len(self.keys):
+                raise ValueError("cursor arity mismatch")
+            position = [
+                self.fields[name].to_python(value)
+                for (name, _), value in zip(self.keys, values)
+            ]
+            return KeysetCursor(position=position, reverse=bool(payload["r"]))
+        except (
+            binascii.Error,
+            UnicodeDecodeError,
+            ValueError,
+            KeyError,
+            TypeError,
+            DjangoValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self.position_of(self.page[-1])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(KeysetCursor(position=position, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self.position_of(self.page[0])
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(KeysetCursor(position=position, reverse=True))
+
+    # ---- response / schema ----
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload.update(self.get_count_fields())
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        if self.include_count:
+            parameters.append(
+                {
+                    "name": self.count_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "Set to 0 to skip the total count.",
+                    "schema": {"type": "boolean"},
+                }
+            )
+        return parameters
+
+
+class CachedCountPagination(KeysetPagination):
+    """
+    KeysetPagination without a COUNT(*) on every request:
+
+    - counts are cached for COUNT_CACHE_SECONDS per filter, keyed by the
+      count query's SQL: orderings, cursors and parameter order share an
+      entry, differently scoped querysets (e.g. per user) never do
+    - the key also carries the versions of the view's `cache_models` (the
+      queryset's model without them), so a version bump drops the counts
+    - on PostgreSQL an unfiltered table of at least COUNT_ESTIMATE_MIN_ROWS
+      rows is counted from the planner's estimate (pg_class.reltuples, kept
+      current by autovacuum/ANALYZE)
+    - `count_is_estimate` tells the two apart; ?count=exact always runs
+      COUNT(*) and refreshes the cached value
+
+    A cached count may lag writes that skip the bump by up to
+    COUNT_CACHE_SECONDS.
+    """
+
+    exact_count_value = "exact"
+
+    def wants_exact_count(self, request) -> bool:
+        raw = request.query_params.get(self.count_query_param, "")
+        return raw.strip().lower() == self.exact_count_value
+
+    def get_count(self, queryset) -> int:
+        key = self.count_cache_key(
+            queryset, model_versions(self.count_models(queryset))
+        )
+        if key is None:
+            self.count_is_estimate = False
+            return 0
+        exact = self.wants_exact_count(self.request)
+        cached = None if exact else cache.get(key)
+        if cached is None:
+            estimate = None if exact else self.estimate_count(queryset)
+            if estimate is not None:
+                cached = (estimate, True)
+            else:
+                cached = (queryset.count(), False)
+            cache.set(key, cached, settings.COUNT_CACHE_SECONDS)
+        count, self.count_is_estimate = cached
+        return count
+
+    async def aget_count(self, queryset) -> int:
+        key = self.count_cache_key(
+            queryset, await amodel_versions(self.count_models(queryset))
+        )
+        if key is None:
+            self.count_is_estimate = False
+            return 0
+        exact = self.wants_exact_count(self.request)
+        cached = None if exact else await cache.aget(key)
+        if cached is None:
+            if exact:
+                estimate = None
+            else:
+                estimate = await sync_to_async(self.estimate_count)(queryset)
+            if estimate is not None:
+                cached = (estimate, True)
+            else:
+                cached = (await queryset.acount(), False)
+            await cache.aset(key, cached, settings.COUNT_CACHE_SECONDS)
+        count, self.count_is_estimate = cached
+        return count
+
+    def count_models(self, queryset):
+        return getattr(self.view, "cache_models", None) or (queryset.model,)
+
+    def count_cache_key(self, queryset, versions) -> str | None:
+        """None when the filter can't match anything (e.g. `pk__in=[]`)."""
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        raw = repr((sql, params, versions))
+        return "count:" + hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+    def estimate_count(self, queryset) -> int | None:
+        """Planner row estimate if `queryset` is a whole (large) table."""
+        connection = connections[queryset.db]
+        query = queryset.query
+        if (
+            connection.vendor != "postgresql"
+            or query.where
+            or query.distinct
+            or query.combinator
+            or query.group_by is not None
+            or query.is_sliced
+        ):
+            return None
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+            (estimate,) = cursor.fetchone()
+        # -1 until first analyzed; small tables are cheap to count exactly
+        if estimate < settings.COUNT_ESTIMATE_MIN_ROWS:
+            return None
+        return estimate
+
+    def get_count_fields(self) -> dict:
+        return {"count": self.count, "count_is_estimate": self.count_is_estimate}
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": response_schema["properties"].pop("count"),
+            "count_is_estimate": {"type": "boolean", "example": False},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        for parameter in parameters:
+            if parameter["name"] == self.count_query_param:
+                parameter["description"] = (
+                    "Set to 0 to skip the total count, or to `exact` for an "
+                    "exact, freshly computed one."
+                )
+                parameter["schema"] = {"type": "string"}
+        return parameters
@@ -0,0 +1,72 @@
+"""
+orjson-backed drop-ins for DRF's JSONRenderer / JSONParser, selected in
+REST_FRAMEWORK when FAST_JSON is on. orjson encodes str/int/float/dict/list
+and UUIDs in C; anything else (datetimes, Decimal, Promise, ...) goes
+through DRF's encoder, so the bytes match JSONRenderer's (orjson would
+round sub-minute UTC offsets; serializers hand over strings anyway).
+Without orjson, or for output orjson can't produce (indented JSON,
+integers past 64 bits, non-default UNICODE_JSON / COMPACT_JSON /
+STRICT_JSON), the stdlib classes run instead.
+
+Known differences, none of which the API emits: floats needing an exponent
+render as 1e16 rather than 1e+16, NaN/Infinity render as null rather than
+failing, parse error messages are orjson's, and integers past 64 bits
+parse as floats.
+"""
+
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DRF escapes these so the output is also valid JavaScript
+LINE_SEPARATORS = (b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+# types orjson doesn't know, encoded exactly as JSONRenderer would
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=encode_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # let the stdlib encode it, or raise its usual error
+            return super().render(data, accepted_media_type, renderer_context)
+        if LINE_SEPARATORS[0] in ret or LINE_SEPARATORS[1] in ret:
+            ret = ret.replace(LINE_SEPARATORS[0], b"\\u2028")
+            ret = ret.replace(LINE_SEPARATORS[1], b"\\u2029")
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -1 +1,435 @@
-# Create your tests here.
+import io
+import json
+import uuid
+from contextlib import nullcontext
+from datetime import UTC, date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.cart.models import Cart, CartItem
+from apps.cart.serializers import CartSerializer, CartValuesSerializer
+from apps.catalog.models import (
+    Attribute,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+)
+from apps.catalog.serializers import (
+    CategorySerializer,
+    ProductCardSerializer,
+    ProductCardValuesSerializer,
+    ProductSerializer,
+    ProductValuesSerializer,
+)
+from apps.catalog.services import product_card_queryset, product_detail_queryset
+from apps.common import renderers
+from apps.common.cache import bump_model_version, model_versions
+from apps.common.pagination import CachedCountPagination, KeysetPagination
+from apps.common.renderers import FastJSONParser, FastJSONRenderer
+from apps.common.values import ValuesSerializer
+from apps.orders.models import Address, Order, OrderItem
+from apps.orders.serializers import OrderSerializer, OrderValuesSerializer
+
+TOKYO = ZoneInfo("Asia/Tokyo")
+
+EDGE_VALUES = {
+    "aware": datetime(2024, 3, 9, 23, 59, 59, 123456, tzinfo=TOKYO),
+    "utc": datetime(2024, 3, 9, 14, 59, 59, tzinfo=UTC),
+    "naive": datetime(2024, 3, 9, 23, 59, 59),
+    "lmt_offset": datetime(1880, 1, 1, 12, tzinfo=TOKYO),
+    "date": date(2024, 2, 29),
+    "time": time(8, 30, 0, 500),
+    "duration": timedelta(days=1, seconds=5),
+    "decimals": [Decimal("1234.50"), Decimal("-0.1"), Decimal(0)],
+    "lazy": gettext_lazy("This field is required."),
+    "separators": "line\u2028para\u2029end",
+    "text": '靴 🥾 \x00\x1f "quoted" \\ </script>',
+    "ints": [0, -1, 2**53 + 1, 2**63 - 1, 2**63, 2**64 - 1, -(2**63)],
+    "floats": [0.1, 1.5, -0.0, 1e15, 4.25],
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "int_keys": {1: "one", 2: "two"},
+    "nested": {"empty": {}, "list": [], "none": None, "bools": [True, False]},
+}
+
+
+class CommerceTestData(TestCase):
+    """A catalogue, a cart and orders covering the empty and null cases."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+        category = Category.objects.create(name="靴 Shoes")
+        Category.objects.create(name="Boots", parent=category)
+        colour = Attribute.objects.create(name="Colour")
+        size = Attribute.objects.create(name="Size")
+
+        cls.full = Product.objects.create(
+            title="Trail boot 🥾",
+            description="Waterproof.\u2028Second line\u2029and a </script>",
+            category=category,
+            price=12800,
+            stock_quantity=3,
+            rating_avg=4.25,
+            rating_count=4,
+            rating_4=3,
+            rating_5=1,
+        )
+        ProductImage.objects.create(
+            product=cls.full, url="https://img.example.com/b.jpg", sort_rank=1
+        )
+        ProductImage.objects.create(
+            product=cls.full,
+            url="https://img.example.com/a.jpg",
+            alt="Side",
+            is_primary=True,
+        )
+        ProductAttribute.objects.create(
+            product=cls.full, attribute=colour, value_text="Black", sort_rank=0
+        )
+        ProductAttribute.objects.create(
+            product=cls.full, attribute=size, value_text="27.5", sort_rank=1
+        )
+        # no images, no attributes, out of stock
+        cls.bare = Product.objects.create(
+            title="Laces", category=category, price=0, stock_quantity=0
+        )
+
+        cls.cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cls.cart, product=cls.full, quantity=2)
+        CartItem.objects.create(cart=cls.cart, product=cls.bare, quantity=1)
+        cls.empty_cart = Cart.objects.create(
+            user=get_user_model().objects.create_user(
+                username="browser", email="browser@example.com", password="x"
+            )
+        )
+
+        address = Address.objects.create(
+            user=user,
+            full_name="山田 太郎",
+            line1="1-1 Chiyoda",
+            city="Chiyoda-ku",
+            prefecture="Tokyo",
+            postal_code="100-0001",
+        )
+        cls.order = Order.objects.create(
+            user=user,
+            status=Order.Status.PAID,
+            subtotal_amount=25600,
+            shipping_address=address,
+        )
+        OrderItem.objects.create(
+            order=cls.order,
+            product=cls.full,
+            product_title=cls.full.title,
+            unit_price=cls.full.price,
+            quantity=2,
+        )
+        # no addresses, no lines
+        cls.empty_order = Order.objects.create(user=user)
+
+    def payloads(self) -> dict:
+        products = product_detail_queryset(Product.objects.order_by("title"))
+        return {
+            "products": ProductSerializer(products, many=True).data,
+            "cards": ProductCardSerializer(
+                product_card_queryset(Product.objects.order_by("title")), many=True
+            ).data,
+            "cart": CartSerializer(self.cart).data,
+            "empty_cart": CartSerializer(self.empty_cart).data,
+            "orders": OrderSerializer(
+                Order.objects.order_by("created_at"), many=True
+            ).data,
+        }
+
+
+class FastJSONTests(CommerceTestData):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_payloads_render_identically(self):
+        dumps = mock.Mock(wraps=renderers.orjson.dumps)
+        with mock.patch.object(renderers.orjson, "dumps", dumps):
+            for name, data in self.payloads().items():
+                with self.subTest(name):
+                    self.assertSameBytes(data)
+        # ...and orjson produced them, not the stdlib fallback
+        self.assertEqual(dumps.call_count, len(self.payloads()))
+
+    def test_edge_values_render_identically(self):
+        for name, value in EDGE_VALUES.items():
+            with self.subTest(name):
+                self.assertSameBytes({name: value})
+        self.assertSameBytes(EDGE_VALUES)
+
+    def test_unsupported_output_falls_back(self):
+        self.assertSameBytes({"huge": 2**64, "small": -(2**63) - 1})
+        self.assertSameBytes(None)
+        data = self.payloads()["cart"]
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_parser_round_trip(self):
+        bodies = [JSONRenderer().render(data) for data in self.payloads().values()]
+        bodies.append(JSONRenderer().render(EDGE_VALUES))
+        for body in bodies:
+            parsed = FastJSONParser().parse(io.BytesIO(body))
+            self.assertEqual(parsed, JSONParser().parse(io.BytesIO(body)))
+            self.assertEqual(FastJSONRenderer().render(parsed), body)
+
+    def test_parser_errors(self):
+        for body in [b"", b"{", b'{"a": 1,}', b"\xff"]:
+            with self.subTest(body), self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+        latin1 = json.dumps({"name": "café"}, ensure_ascii=False).encode("latin-1")
+        self.assertEqual(
+            FastJSONParser().parse(
+                io.BytesIO(latin1), parser_context={"encoding": "latin-1"}
+            ),
+            {"name": "café"},
+        )
+
+
+class DecimalProductSerializer(serializers.ModelSerializer):
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    rating_avg = serializers.DecimalField(
+        max_digits=4, decimal_places=2, coerce_to_string=False
+    )
+
+    class Meta:
+        model = Product
+        fields = ["id", "price", "rating_avg", "category"]
+
+
+class DecimalProductValuesSerializer(ValuesSerializer):
+    serializer_class = DecimalProductSerializer
+
+
+class CategoryValuesSerializer(ValuesSerializer):
+    serializer_class = CategorySerializer
+
+
+class ValuesSerializerContractTests(CommerceTestData):
+    """Each ValuesSerializer renders the same bytes as the serializer it mirrors."""
+
+    def assertMirrors(self, values_class, queryset, queries=None):
+        values = values_class()
+        with self.assertNumQueries(queries) if queries else nullcontext():
+            rows = values.serialize(values.values(queryset))
+        expected = values_class.serializer_class(queryset, many=True).data
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+        return rows
+
+    def test_product_cards(self):
+        queryset = product_card_queryset(Product.objects.order_by("title"))
+        rows = self.assertMirrors(ProductCardValuesSerializer, queryset, queries=2)
+        # the primary image wins over a lower sort_rank; no images -> null
+        self.assertEqual(rows[1]["primary_image"]["alt"], "Side")
+        self.assertIsNone(rows[0]["primary_image"])
+
+    def test_products(self):
+        queryset = product_detail_queryset(Product.objects.order_by("title"))
+        rows = self.assertMirrors(ProductValuesSerializer, queryset, queries=3)
+        self.assertEqual((rows[0]["images"], rows[0]["attributes"]), ([], []))
+        self.assertEqual(rows[1]["rating_histogram"]["4"], 3)
+        self.assertEqual([row["in_stock"] for row in rows], [False, True])
+
+    def test_carts(self):
+        rows = self.assertMirrors(
+            CartValuesSerializer, Cart.objects.order_by("created_at")
+        )
+        self.assertEqual(rows[0]["subtotal_amount"], 2 * 12800)
+        self.assertEqual(rows[1]["items"], [])
+
+    def test_orders(self):
+        queryset = Order.objects.order_by("created_at")
+        rows = self.assertMirrors(OrderValuesSerializer, queryset, queries=3)
+        self.assertEqual(rows[0]["items"][0]["line_total"], 2 * 12800)
+        self.assertIsNone(rows[0]["billing_address"])
+        self.assertEqual((rows[1]["items"], rows[1]["shipping_address"]), ([], None))
+
+    def test_null_foreign_keys(self):
+        rows = self.assertMirrors(
+            CategoryValuesSerializer, Category.objects.order_by("depth")
+        )
+        self.assertIsNone(rows[0]["parent"])
+        self.assertIsNotNone(rows[1]["parent"])
+
+    def test_decimal_fields(self):
+        rows = self.assertMirrors(
+            DecimalProductValuesSerializer, Product.objects.order_by("title")
+        )
+        self.assertEqual(rows[1]["price"], "12800.00")
+        self.assertEqual(rows[1]["rating_avg"], Decimal("4.25"))
+
+    def test_fields_that_are_not_columns_must_be_computed(self):
+        class Incomplete(ValuesSerializer):
+            serializer_class = ProductCardSerializer
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "primary_image"):
+            Incomplete().columns()
+
+
+class ModelVersionTests(TestCase):
+    def test_bump_waits_for_commit(self):
+        (before,) = model_versions([Product])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                bump_model_version(Product)
+                self.assertEqual(model_versions([Product]), [before])
+            # TestCase's own transaction is still open
+            self.assertEqual(model_versions([Product]), [before])
+        self.assertEqual(model_versions([Product]), [before + 1])
+
+    def test_rolled_back_writes_do_not_bump(self):
+        (before,) = model_versions([Product])
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                bump_model_version(Product)
+                1 / 0
+        self.assertEqual(model_versions([Product]), [before])
+
+
+@override_settings(CATALOG_CACHE_SECONDS=60)
+class ResponseCacheTests(CommerceTestData):
+    url = "/api/catalog/products/"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_etag_follows_the_body(self):
+        first = self.client.get(self.url)
+        self.assertEqual((first.status_code, first["X-Cache"]), (200, "MISS"))
+        etag = first["ETag"]
+
+        hit = self.client.get(self.url)
+        self.assertEqual((hit["X-Cache"], hit["ETag"]), ("HIT", etag))
+        self.assertEqual(hit.content, first.content)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.full.pk).update(price=9900)
+            bump_model_version(Product)
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        self.assertIn(b"9900", changed.content)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=changed["ETag"]).status_code,
+            304,
+        )
+
+    def test_same_version_different_body_gets_a_different_tag(self):
+        # a write the version doesn't know about yet (pre-commit read, lagging
+        # replica) must not be covered by the tag of the body it replaced
+        etag = self.client.get(self.url)["ETag"]
+        cache.clear()
+        Product.objects.filter(pk=self.full.pk).update(price=9900)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_authenticated_requests_are_conditional_too(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.get(username="buyer"))
+        response = client.get(self.url)
+        self.assertNotIn("X-Cache", response)
+        self.assertEqual(
+            client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Ties")
+        # long runs of equal sort keys, split across page boundaries
+        Product.objects.bulk_create(
+            Product(title=f"P{i}", category=category, price=price)
+            for i, price in enumerate([300, 100, 200, 100, 300, 100, 200, 100, 300])
+        )
+
+    def page(self, ordering, url):
+        paginator = KeysetPagination()
+        request = Request(APIRequestFactory().get(url))
+        rows = paginator.paginate_queryset(Product.objects.order_by(ordering), request)
+        payload = paginator.get_paginated_response([row.pk for row in rows]).data
+        return payload["results"], payload["next"], payload["previous"]
+
+    def test_walks_both_ways_over_equal_keys(self):
+        # the primary key breaks ties in the leading key's direction
+        for ordering, tie_breaker in (("price", "pk"), ("-price", "-pk")):
+            with self.subTest(ordering=ordering):
+                expected = list(
+                    Product.objects.order_by(ordering, tie_breaker).values_list(
+                        "pk", flat=True
+                    )
+                )
+                pages, url = [], "/?page_size=2"
+                while url:
+                    rows, url, previous = self.page(ordering, url)
+                    pages.append(rows)
+                self.assertEqual(sum(pages, []), expected)
+
+                # and back from the last page, page for page
+                back, url = [pages[-1]], previous
+                while url:
+                    rows, _, url = self.page(ordering, url)
+                    back.append(rows)
+                self.assertEqual(back[::-1], pages)
+
+
+class CachedCountPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Counted")
+        Product.objects.bulk_create(
+            Product(title=f"P{i}", category=cls.category, price=100) for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def count(self, query=""):
+        paginator = CachedCountPagination()
+        request = Request(APIRequestFactory().get(f"/?page_size=2{query}"))
+        view = mock.Mock(cache_models=(Product, Category))
+        paginator.paginate_queryset(Product.objects.order_by("title"), request, view)
+        return paginator.count
+
+    def test_count_is_reused_until_a_version_bump(self):
+        self.assertEqual(self.count(), 3)
+        # bulk_create sends no signals: nothing tells the cache yet
+        Product.objects.bulk_create(
+            [Product(title="P3", category=self.category, price=100)]
+        )
+        with self.assertNumQueries(1):  # the page only
+            self.assertEqual(self.count(), 3)
+        self.assertEqual(self.count("&count=exact"), 4)
+
+        Product.objects.bulk_create(
+            [Product(title="P4", category=self.category, price=100)]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_model_version(Category)
+        self.assertEqual(self.count(), 5)
@@ -132,6 +132,10 @@ class Order(TimeStampedModel):
             models.Index(
                 fields=["status", "created_at"], name="ix_order_status_created"
             ),
+            # cancellations since a job's checkpoint (apps.catalog.popularity)
+            models.Index(
+                fields=["status", "updated_at"], name="ix_order_status_updated"
+            ),
         ]
 
     def __str__(self) -> str:
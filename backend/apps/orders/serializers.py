@@ -1,5 +1,19 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, Address
+from apps.common.values import ValuesSerializer
+
+# an order's address snapshot, after its "id"
+ADDRESS_FIELDS = (
+    "full_name",
+    "line1",
+    "line2",
+    "city",
+    "prefecture",
+    "postal_code",
+    "country_code",
+    "phone",
+    "type",
+)
 
 
 class AddressSerializer(serializers.Serializer):
@@ -51,21 +65,60 @@ class OrderSerializer(serializers.ModelSerializer):
     def _addr(self, a: Address):
         if not a:
             return None
-        return {
-            "id": str(a.id),
-            "full_name": a.full_name,
-            "line1": a.line1,
-            "line2": a.line2,
-            "city": a.city,
-            "prefecture": a.prefecture,
-            "postal_code": a.postal_code,
-            "country_code": a.country_code,
-            "phone": a.phone,
-            "type": a.type,
-        }
+        return {"id": str(a.id), **{name: getattr(a, name) for name in ADDRESS_FIELDS}}
 
     def get_shipping_address(self, obj):
         return self._addr(obj.shipping_address)
 
     def get_billing_address(self, obj):
         return self._addr(obj.billing_address)
+
+
+# ---- values-based mirrors (apps.common.values) ----
+class OrderItemValuesSerializer(ValuesSerializer):
+    serializer_class = OrderItemSerializer
+    computed = ("line_total",)
+
+    def get_line_total(self, row, related):
+        return row["unit_price"] * row["quantity"]
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    """OrderSerializer from rows: 3 queries per page (orders, lines, addresses)."""
+
+    serializer_class = OrderSerializer
+    computed = ("items", "shipping_address", "billing_address")
+    extra_columns = ("shipping_address", "billing_address")
+
+    def fetch_related(self, rows):
+        items = OrderItemValuesSerializer()
+        address_ids = {
+            row[name]
+            for row in rows
+            for name in ("shipping_address", "billing_address")
+            if row[name] is not None
+        }
+        return {
+            "items": items.serialize_by(
+                items.values(
+                    OrderItem.objects.filter(order__in=[row["id"] for row in rows]),
+                    "order",
+                ),
+                "order",
+            ),
+            "addresses": {
+                row["id"]: {"id": str(row["id"]), **{n: row[n] for n in ADDRESS_FIELDS}}
+                for row in Address.objects.filter(pk__in=address_ids).values(
+                    "id", *ADDRESS_FIELDS
+                )
+            },
+        }
+
+    def get_items(self, row, related):
+        return related["items"].get(row["id"], [])
+
+    def get_shipping_address(self, row, related):
+        return related["addresses"].get(row["shipping_address"])
+
+    def get_billing_address(self, row, related):
+        return related["addresses"].get(row["billing_address"])
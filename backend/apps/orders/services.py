@@ -4,6 +4,7 @@ from django.db import transaction
 from django.db.models import Prefetch
 from apps.cart.services import get_cart, clear_cart  # reuse your helpers
 from apps.catalog.models import Product
+from apps.catalog.services import StockAdjustment, adjust_stock
 from .models import Order, OrderItem, Address
 
 
@@ -61,13 +62,18 @@ def place_order_for_user(
     if not lines:
         raise OrderError("Cart is empty.")
 
-    # stock checks + decrement
+    # stock checks + decrement (one guarded UPDATE for the whole cart)
     for snap in lines:
         p = snap.product
         if not (getattr(p, "is_active", False) and getattr(p, "in_stock", False)):
             raise OrderError(f"Product unavailable: {p.title}")
-        if p.decrement_stock(snap.quantity) == 0:
-            raise OrderError(f"Insufficient stock: {p.title}")
+    results = adjust_stock(
+        StockAdjustment(snap.product.pk, delta=-snap.quantity) for snap in lines
+    )
+    titles = {snap.product.pk: snap.product.title for snap in lines}
+    for result in results:
+        if not result.ok:
+            raise OrderError(f"Insufficient stock: {titles[result.product_id]}")
 
     # addresses
     ship_addr = _create_address_for_user(
@@ -114,9 +120,9 @@ def cancel_order(order: Order) -> Order:
         raise OrderError("Only pending/paid orders can be cancelled.")
 
     # Put stock back
-    items = order.items.select_related("product")
-    for it in items:
-        it.product.increment_stock(it.quantity)
+    adjust_stock(
+        StockAdjustment(it.product_id, delta=it.quantity) for it in order.items.all()
+    )
 
     order.status = Order.Status.CANCELLED
     order.save(update_fields=["status", "updated_at"])
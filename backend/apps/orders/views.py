@@ -2,14 +2,18 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from apps.common.pagination import KeysetPagination
+from apps.common.values import ValuesListMixin
 from .models import Order
-from .serializers import OrderSerializer, AddressSerializer
+from .serializers import OrderSerializer, OrderValuesSerializer, AddressSerializer
 from .services import place_order_for_user, cancel_order, OrderError
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    list_values_class = OrderValuesSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # user-scoped orders
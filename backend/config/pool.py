@@ -0,0 +1,94 @@
+"""
+Database connections sized to the gunicorn topology.
+
+Every gunicorn worker process owns its own psycopg pool and every gthread
+thread holds at most one connection at a time, so a worker never needs more
+than GUNICORN_THREADS connections and the deployment needs
+workers × max_size per database. gunicorn.conf.py calls
+check_connection_budget() in the master before any worker forks, so a
+configuration PostgreSQL can't serve fails at startup instead of under load.
+"""
+
+import multiprocessing
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+# left free for migrations, cron jobs, psql and replication on each server
+DEFAULT_RESERVED_CONNECTIONS = 10
+
+
+def gunicorn_workers() -> int:
+    # same defaults as gunicorn.conf.py
+    return int(os.getenv("GUNICORN_WORKERS") or multiprocessing.cpu_count() * 2 + 1)
+
+
+def gunicorn_threads() -> int:
+    return int(os.getenv("GUNICORN_THREADS") or 4)
+
+
+def pool_options(threads: int) -> dict:
+    """OPTIONS["pool"] for one worker process (psycopg_pool.ConnectionPool)."""
+    max_size = int(os.getenv("DB_POOL_MAX_SIZE") or threads)
+    min_size = int(os.getenv("DB_POOL_MIN_SIZE") or max(1, max_size // 2))
+    if not 1 <= min_size <= max_size:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MIN_SIZE ({min_size}) must be between 1 and "
+            f"DB_POOL_MAX_SIZE ({max_size})"
+        )
+    return {
+        "min_size": min_size,
+        "max_size": max_size,
+        # a request waits this long for a free connection, then errors
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT") or 10),
+        # idle connections above min_size are closed after this long
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE") or 300),
+    }
+
+
+def connections_per_worker(settings_dict: dict, threads: int) -> int:
+    pool = settings_dict.get("OPTIONS", {}).get("pool")
+    if isinstance(pool, dict):
+        return pool.get("max_size", threads)
+    # persistent (or per-request) connections: one per thread
+    return threads
+
+
+def check_connection_budget(workers: int, threads: int) -> None:
+    """
+    Raise ImproperlyConfigured when `workers` processes would open more
+    connections than a database server accepts from ordinary roles.
+    Databases sharing a server (same HOST/PORT) are counted together.
+    """
+    from django.db import connections
+
+    servers = {}
+    for alias in connections:
+        conn = connections[alias]
+        if conn.vendor != "postgresql":
+            continue
+        key = (conn.settings_dict["HOST"], conn.settings_dict["PORT"])
+        needed = workers * connections_per_worker(conn.settings_dict, threads)
+        if key in servers:
+            servers[key][1] += needed
+        else:
+            servers[key] = [alias, needed]
+
+    reserved = int(os.getenv("DB_RESERVED_CONNECTIONS") or DEFAULT_RESERVED_CONNECTIONS)
+    for alias, needed in servers.values():
+        conn = connections[alias]
+        # a plain connection: the pool must not be opened in the master
+        with conn.Database.connect(**conn.get_connection_params()) as raw:
+            row = raw.execute(
+                "SELECT current_setting('max_connections')::int,"
+                " current_setting('superuser_reserved_connections')::int"
+            ).fetchone()
+        available = row[0] - row[1] - reserved
+        if needed > available:
+            raise ImproperlyConfigured(
+                f"Database '{alias}': {workers} workers × "
+                f"{needed // workers} connections = {needed}, but max_connections "
+                f"leaves {available} ({row[0]} - {row[1]} superuser reserved - "
+                f"{reserved} DB_RESERVED_CONNECTIONS). Lower GUNICORN_WORKERS, "
+                f"GUNICORN_THREADS or DB_POOL_MAX_SIZE, or raise max_connections."
+            )
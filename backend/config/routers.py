@@ -0,0 +1,151 @@
+"""
+Primary/replica database routing.
+
+Only safe-method (GET/HEAD/OPTIONS) requests read from replicas, and only
+for REPLICA_APPS; everything else (writes, checkout, cart, management
+commands, jobs) stays on "default". A request that writes is pinned to the
+primary for the rest of the request, and ReplicaRoutingMiddleware sets a
+short-lived cookie so the same client reads its own writes on the next few
+requests while the replicas catch up. "Writes" means a data-changing
+statement ran on the primary (record_writes), not that the router was asked
+for a write alias: get_or_create() asks on every call.
+"""
+
+import contextvars
+import random
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# app labels whose reads may be served slightly stale
+REPLICA_APPS = {"catalog"}
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# statements that change data; SELECT (FOR UPDATE), SAVEPOINT etc. don't pin
+WRITE_SQL = re.compile(r"\s*(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b", re.IGNORECASE)
+
+
+@dataclass
+class _Routing:
+    use_replicas: bool = False
+    wrote: bool = False
+
+
+# per request (per task under ASGI); outside a request everything is primary
+_routing: contextvars.ContextVar[_Routing | None] = contextvars.ContextVar(
+    "db_routing", default=None
+)
+
+
+def pin_to_primary() -> None:
+    """Send the rest of the current request to the primary."""
+    routing = _routing.get()
+    if routing is not None:
+        routing.use_replicas = False
+
+
+def record_writes(execute, sql, params, many, context):
+    """Execute wrapper on the primary: pins the request once a statement writes."""
+    result = execute(sql, params, many, context)
+    routing = _routing.get()
+    if routing is not None and isinstance(sql, str) and WRITE_SQL.match(sql):
+        routing.use_replicas = False
+        routing.wrote = True
+    return result
+
+
+def watch_writes(sender, connection, **kwargs):
+    """connection_created receiver installing record_writes on the primary."""
+    if (
+        connection.alias == DEFAULT_DB_ALIAS
+        and record_writes not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(record_writes)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """Route reads of REPLICA_APPS to replicas inside the block."""
+    token = _routing.set(_Routing(use_replicas=enabled))
+    try:
+        yield _routing.get()
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or not routing.use_replicas
+            or not settings.REPLICA_DATABASES
+            or model._meta.app_label not in REPLICA_APPS
+            # reads inside a transaction must see its writes
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        # pinning waits for an actual write (record_writes)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Opens the routing scope for each request: safe methods without a pin
+    cookie may read from replicas. Responses to requests that wrote set the
+    pin cookie for REPLICA_PIN_SECONDS. Runs natively under WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.replicas_enabled(request)) as routing:
+            response = self.get_response(request)
+        return self.process_response(request, response, routing)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so ORM calls see this scope
+        with replica_reads(self.replicas_enabled(request)) as routing:
+            response = await self.get_response(request)
+        return self.process_response(request, response, routing)
+
+    def replicas_enabled(self, request) -> bool:
+        return (
+            bool(settings.REPLICA_DATABASES)
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    def process_response(self, request, response, routing):
+        if routing.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+                secure=request.is_secure(),
+            )
+        return response
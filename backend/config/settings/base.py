@@ -4,6 +4,8 @@ from datetime import timedelta
 from django.core.exceptions import ImproperlyConfigured
 import warnings
 
+from config.pool import gunicorn_threads, pool_options
+
 # Silence only dj-rest-auth deprecation UserWarnings (e.g., AUTHENTICATION_METHOD → LOGIN_METHODS)
 warnings.filterwarnings("ignore", category=UserWarning, module=r"^dj_rest_auth(\.|$)")
 
@@ -63,6 +65,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
     # 3rd-party
     "rest_framework",
     "django_filters",
@@ -87,6 +90,7 @@ INSTALLED_APPS = [
 # ---------- middleware (CSRF ON; keep prod-like) ----------
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "config.routers.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -133,6 +137,56 @@ DATABASES = {
     }
 }
 
+# ---------- connection reuse ----------
+# PostgreSQL: a psycopg pool per gunicorn worker, sized from GUNICORN_THREADS
+# (config.pool; gunicorn.conf.py refuses to start past max_connections).
+# DB_POOL=false keeps one persistent connection per thread instead, e.g.
+# behind pgbouncer.
+DB_POOL = os.getenv("DB_POOL", "true").strip().lower() in {"1", "true", "yes", "on"}
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+if DB_ENGINE == "django.db.backends.postgresql" and DB_POOL:
+    DATABASES["default"]["OPTIONS"] = {"pool": pool_options(gunicorn_threads())}
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE") or 60)
+
+# ---------- read replicas (optional) ----------
+# DB_REPLICAS=host[:port],... same database name/credentials as the primary
+# unless DB_REPLICA_NAME is set (e.g. a second local database for testing).
+# Safe-method catalog reads go to a random replica (config.routers).
+REPLICA_DATABASES = []
+for _index, _replica in enumerate(
+    env_list("DB_REPLICAS") if os.getenv("DB_REPLICAS", "").strip() else [], start=1
+):
+    _host, _, _port = _replica.partition(":")
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME") or DB_NAME,
+        "HOST": _host,
+        "PORT": _port or DB_PORT,
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(f"replica_{_index}")
+DATABASE_ROUTERS = ["config.routers.PrimaryReplicaRouter"]
+# after a write, that client reads from the primary for this long
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS") or 15)
+
+# ---------- cache ----------
+# locmem is per-process: with several gunicorn workers use a shared backend
+# (file-based on one host, redis/memcached across hosts) so that version bumps
+# made by one worker invalidate responses cached by the others.
+CACHES = {
+    "default": {
+        "BACKEND": env_required("CACHE_BACKEND"),
+        "LOCATION": env_required("CACHE_LOCATION"),
+    }
+}
+# anonymous catalog GET responses (apps.common.cache.CachedResponseMixin)
+CATALOG_CACHE_SECONDS = env_int("CATALOG_CACHE_SECONDS")
+# paginated totals (apps.common.pagination.CachedCountPagination)
+COUNT_CACHE_SECONDS = int(os.getenv("COUNT_CACHE_SECONDS") or 30)
+# unfiltered PostgreSQL tables this big: planner estimate instead of COUNT(*)
+COUNT_ESTIMATE_MIN_ROWS = int(os.getenv("COUNT_ESTIMATE_MIN_ROWS") or 10000)
+
 # ---------- auth/backends ----------
 AUTHENTICATION_BACKENDS = [
     # "axes.backends.AxesStandaloneBackend",
@@ -150,6 +204,14 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 # ---------- DRF / JWT ----------
+# FAST_JSON=true swaps in the orjson-backed JSON renderer/parser
+# (apps.common.renderers), byte-for-byte compatible with DRF's own
+FAST_JSON = bool(os.getenv("FAST_JSON", "").strip()) and env_bool("FAST_JSON")
+JSON_RENDERER, JSON_PARSER = (
+    ("apps.common.renderers.FastJSONRenderer", "apps.common.renderers.FastJSONParser")
+    if FAST_JSON
+    else ("rest_framework.renderers.JSONRenderer", "rest_framework.parsers.JSONParser")
+)
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -162,6 +224,15 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        JSON_RENDERER,
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        JSON_PARSER,
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 24,
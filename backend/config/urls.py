@@ -11,6 +11,7 @@ from django.contrib.auth import views as auth_views  # optional
 urlpatterns = [
     path("api/admin/", admin.site.urls),
     path("api/catalog/", include("apps.catalog.urls")),
+    path("api/async/catalog/", include("apps.catalog.async_urls")),
     path("api/cart/", include("apps.cart.urls")),
     path("api/orders/", include("apps.orders.urls")),
     path("api/payments/", include("apps.payments.urls")),
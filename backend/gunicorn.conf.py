@@ -10,3 +10,15 @@ graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL", "30"))
 accesslog = "-"
 errorlog = "-"
 loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    # refuse worker × pool sizes the database can't serve (config.pool)
+    import django
+    from django.db import connections
+
+    django.setup()
+    from config.pool import check_connection_budget
+
+    check_connection_budget(server.cfg.workers, server.cfg.threads)
+    connections.close_all()